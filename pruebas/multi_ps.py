@@ -10,23 +10,32 @@
 # Lanzador de múltiples Procesos Solicitantes (PS) en paralelo.
 # Genera carga concurrente para medir rendimiento del sistema.
 
+import io
 import os
+import re
 import sys
 import time
+import mmap
+import contextlib
 import subprocess
 import argparse
-import json
+import orjson
 from pathlib import Path
-from datetime import datetime
+from datetime import datetime, timezone
 
 # Configuración
 ROOT = Path(__file__).resolve().parents[1]
 PS_SCRIPT = ROOT / "ps" / "ps.py"
-GEN_SCRIPT = ROOT / "ps" / "gen_solicitudes.py"
+
+# Núcleo compartido de generación: se importa UNA vez aquí en lugar de
+# lanzar un intérprete nuevo por PS (cada subprocess re-importaba numpy,
+# msgspec y schema sólo para escribir su .bin).
+sys.path.insert(0, str(ROOT / "ps"))
+from gen_solicitudes import generar_solicitudes as _gen_core
 
 def iso():
     """Retorna timestamp ISO-8601."""
-    return datetime.utcnow().isoformat() + "Z"
+    return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
 
 def print_banner():
     """Imprime banner de inicio."""
@@ -46,46 +55,25 @@ def generar_solicitudes(num_ps, requests_per_ps, mix, seed_base):
     print(f"  Solicitudes por PS: {requests_per_ps}")
     print(f"  Mix: {mix}")
 
+    # Llamada directa al núcleo compartido (generar_solicitudes), sin un
+    # subprocess por PS: se eliminan N arranques fríos del intérprete.
+    # Los banners del generador se descartan, igual que antes con
+    # capture_output=True. La generación va en serie (es CPU puro bajo el
+    # GIL); lo que sí corre en paralelo son los PS, más abajo.
     archivos = []
-
     for i in range(num_ps):
-        # Archivo único por PS
         output_file = ROOT / f"solicitudes_ps{i+1}.bin"
 
         # Semilla única para cada PS (reproducible)
         seed = seed_base + i if seed_base else None
 
-        # Comando de generación
-        cmd = [
-            sys.executable,
-            str(GEN_SCRIPT),
-            "--n", str(requests_per_ps),
-            "--mix", mix
-        ]
-
-        if seed:
-            cmd.extend(["--seed", str(seed)])
-
-        # Redirigir salida a archivo específico
-        env = os.environ.copy()
-        env["NUM_SOLICITUDES"] = str(requests_per_ps)
-
         try:
-            # Ejecutar generador
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
-                env=env,
-                cwd=str(ROOT)
-            )
-
-            # Mover archivo generado
-            default_output = ROOT / "solicitudes.bin"
-            if default_output.exists():
-                default_output.rename(output_file)
-                archivos.append(output_file)
+            with contextlib.redirect_stdout(io.StringIO()):
+                _gen_core(requests_per_ps, seed, mix, out=output_file)
+
+            if output_file.exists():
                 print(f"  ✓ PS{i+1}: {output_file.name}")
+                archivos.append(output_file)
             else:
                 print(f"  ✗ PS{i+1}: No se generó el archivo")
 
@@ -112,8 +100,14 @@ def lanzar_ps_paralelo(archivos, timeout, backoff, mode="concurrent"):
         log_file = logs_dir / f"ps{ps_id}.log"
         metrics_file = logs_dir / f"ps{ps_id}_metrics.txt"
 
-        # Preparar comando base para ps.py con log override
-        cmd = [sys.executable, str(PS_SCRIPT), "--log-file", str(metrics_file)]
+        # Preparar comando para ps.py con log e input override
+        # (sin wrapper bash ni cp: cada PS lee su propio archivo vía --input,
+        # así los procesos arrancan de inmediato y de verdad en paralelo)
+        cmd = [
+            sys.executable, str(PS_SCRIPT),
+            "--log-file", str(metrics_file),
+            "--input", str(archivo),
+        ]
 
         if timeout:
             cmd.extend(["--timeout", str(timeout)])
@@ -121,23 +115,12 @@ def lanzar_ps_paralelo(archivos, timeout, backoff, mode="concurrent"):
         if backoff:
             cmd.extend(["--backoff", backoff])
 
-        # Modificar temporalmente para que cada PS use su archivo
-        # Copiamos el archivo al nombre estándar antes de ejecutar
-        solicitudes_temp = ROOT / "solicitudes.bin"
-
         # Abrir archivo de log
         log_f = open(log_file, "w")
 
-        # Crear script wrapper que copia y ejecuta
-        wrapper_cmd = f"""
-cd {ROOT}
-cp {archivo} solicitudes.bin
-{' '.join(cmd)}
-"""
-
-        # Lanzar proceso
+        # Lanzar proceso directamente (fork+exec del intérprete, sin shell)
         proc = subprocess.Popen(
-            ["bash", "-c", wrapper_cmd],
+            cmd,
             stdout=log_f,
             stderr=subprocess.STDOUT,
             cwd=str(ROOT)
@@ -169,19 +152,26 @@ def esperar_procesos(procesos):
     print(f"\n[{iso()}] Esperando a que {len(procesos)} PS terminen...")
 
     inicio_espera = time.time()
-    completados = 0
 
-    while completados < len(procesos):
-        time.sleep(1)
+    # Bloquea en os.waitpid(-1) hasta que termine CUALQUIER hijo, en vez de
+    # despertar cada segundo a sondear: detección inmediata y cero busy-wait.
+    pid_to_info = {p["proceso"].pid: p for p in procesos}
 
-        for ps_info in procesos:
-            if ps_info["proceso"].poll() is not None and "fin" not in ps_info:
-                ps_info["fin"] = time.time()
-                ps_info["duracion"] = ps_info["fin"] - ps_info["inicio"]
-                ps_info["codigo_salida"] = ps_info["proceso"].returncode
-                completados += 1
+    while pid_to_info:
+        pid, status = os.waitpid(-1, 0)
+        ps_info = pid_to_info.pop(pid, None)
+        if ps_info is None:
+            # Hijo ajeno a esta corrida (p. ej. generador ya cosechado)
+            continue
 
-                print(f"  ✓ PS{ps_info['ps_id']} terminado ({ps_info['duracion']:.2f}s, exit={ps_info['codigo_salida']})")
+        ps_info["fin"] = time.time()
+        ps_info["duracion"] = ps_info["fin"] - ps_info["inicio"]
+        codigo = os.waitstatus_to_exitcode(status)
+        ps_info["codigo_salida"] = codigo
+        # Informar a Popen el código para que no intente re-esperar el pid
+        ps_info["proceso"].returncode = codigo
+
+        print(f"  ✓ PS{ps_info['ps_id']} terminado ({ps_info['duracion']:.2f}s, exit={ps_info['codigo_salida']})")
 
     fin_espera = time.time()
     duracion_total = fin_espera - inicio_espera
@@ -194,27 +184,35 @@ def esperar_procesos(procesos):
 
     return procesos
 
+# Línea de métricas válida: contiene request_id=...| (resto de campos detrás)
+_LINEA_METRICA_RE = re.compile(rb"^.*request_id=[^|\n]+\|.*$", re.M)
+
 def consolidar_logs(procesos):
     """
     Consolida los logs de ps_logs.txt de cada PS.
+    Escanea cada archivo vía mmap con una regex precompilada, sin
+    materializar objetos línea de Python por cada registro.
     """
     print(f"\n[{iso()}] Consolidando logs...")
 
     log_consolidado = ROOT / "multi_ps_logs" / "ps_logs_consolidado.txt"
 
     count = 0
-    with open(log_consolidado, "w") as out:
+    with open(log_consolidado, "wb") as out:
         for ps_info in procesos:
             metrics_path = ps_info.get("metrics_file")
-            if metrics_path and Path(metrics_path).exists():
-                with open(metrics_path, "r") as mf:
-                    for linea in mf:
-                        linea = linea.strip()
-                        if not linea:
-                            continue
-                        if "request_id=" in linea and "|" in linea:
-                            out.write(f"PS{ps_info['ps_id']}|{linea}\n")
-                            count += 1
+            if not (metrics_path and Path(metrics_path).exists()):
+                continue
+            prefijo = f"PS{ps_info['ps_id']}|".encode()
+            with open(metrics_path, "rb") as mf:
+                if os.fstat(mf.fileno()).st_size == 0:
+                    continue
+                with mmap.mmap(mf.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    for m in _LINEA_METRICA_RE.finditer(mm):
+                        out.write(prefijo)
+                        out.write(m.group(0).strip())
+                        out.write(b"\n")
+                        count += 1
 
     # Copiar consolidado a ps_logs.txt para compatibilidad
     target = ROOT / "ps_logs.txt"
@@ -232,7 +230,7 @@ def consolidar_logs(procesos):
 
 def parse_consolidado(log_path):
     try:
-        from ps.log_parser import load_lines, compute_metrics
+        from log_parser import load_lines, compute_metrics
     except Exception:
         return None
     if not log_path.exists():
@@ -290,8 +288,8 @@ def generar_reporte(procesos, num_ps, requests_per_ps, mode, mix):
     }
 
     reporte_path = ROOT / "multi_ps_logs" / "reporte_multi_ps.json"
-    with open(reporte_path, "w") as f:
-        json.dump(reporte, f, indent=2)
+    with open(reporte_path, "wb") as f:
+        f.write(orjson.dumps(reporte, option=orjson.OPT_INDENT_2))
 
     print(f"\n📄 Reporte guardado en: {reporte_path}")
 
@@ -368,7 +366,7 @@ def main():
     consolidado_path = ROOT / "multi_ps_logs" / "ps_logs_consolidado.txt"
     if consolidado_path.exists():
         try:
-            from ps.log_parser import load_lines, compute_metrics
+            from log_parser import load_lines, compute_metrics
             rows = list(load_lines(consolidado_path))
             if rows:
                 metrics = compute_metrics(rows, only_ok=False)
@@ -12,10 +12,12 @@
 
 import os
 import sys
+import time
 import zmq
 import json
+import orjson
 from pathlib import Path
-from datetime import datetime
+from datetime import datetime, timezone
 
 # Añadir path para importar módulos del PS
 sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "ps"))
@@ -26,7 +28,7 @@ GC_ADDR = os.getenv("GC_ADDR", "tcp://10.43.101.220:5555")
 
 def iso():
     """Retorna timestamp ISO-8601."""
-    return datetime.utcnow().isoformat() + "Z"
+    return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
 
 def print_banner():
     """Imprime banner de inicio."""
@@ -36,43 +38,62 @@ def print_banner():
     print(f"  GC Target : {GC_ADDR}")
     print("=" * 72 + "\n")
 
-def enviar_payload(ctx, nombre_test, payload_str, descripcion):
+def enviar_pipeline(ctx, casos, timeout_global_s=10.0):
     """
-    Envía un payload al GC y retorna el resultado.
+    Envía TODOS los payloads de una vez por un socket DEALER (con frame de
+    correlación) y drena las respuestas con un Poller: la tanda completa
+    cuesta ~1 RTT en lugar de un round-trip serializado por prueba.
+    Retorna {indice: (estado, respuesta)}.
     """
-    sock = ctx.socket(zmq.REQ)
-    sock.setsockopt(zmq.RCVTIMEO, 3000)
-    sock.setsockopt(zmq.SNDTIMEO, 3000)
-    
-    try:
-        sock.connect(GC_ADDR)
-        
-        print(f"\n[{iso()}] Test: {nombre_test}")
-        print(f"  Descripción : {descripcion}")
-        print(f"  Payload     : {payload_str[:100]}..." if len(payload_str) > 100 else f"  Payload     : {payload_str}")
-        
-        sock.send_string(payload_str)
-        
+    sock = ctx.socket(zmq.DEALER)
+    sock.setsockopt(zmq.LINGER, 0)
+    sock.connect(GC_ADDR)
+
+    poller = zmq.Poller()
+    poller.register(sock, zmq.POLLIN)
+
+    # Submit de toda la tanda (el REP del GC ecoa el frame de correlación)
+    for idx, (_, payload_str, descripcion) in enumerate(casos):
+        print(f"\n[{iso()}] Enviando prueba {idx + 1}: {descripcion}")
+        if len(payload_str) > 100:
+            print(f"  Payload     : {payload_str[:100]}...")
+        else:
+            print(f"  Payload     : {payload_str}")
+        sock.send_multipart([str(idx).encode(), b"", payload_str.encode()])
+
+    # Drenaje: correlaciona por test_id hasta completar o vencer el timeout
+    respuestas = {}
+    pendientes = set(range(len(casos)))
+    deadline = time.time() + timeout_global_s
+
+    while pendientes:
+        restante_ms = int((deadline - time.time()) * 1000)
+        if restante_ms <= 0:
+            break
+        eventos = dict(poller.poll(restante_ms))
+        if sock not in eventos:
+            continue
+        frames = sock.recv_multipart()
         try:
-            respuesta = sock.recv_string()
-            try:
-                resp_obj = json.loads(respuesta)
-                estado = resp_obj.get("estado", resp_obj.get("status", "UNKNOWN"))
-            except:
-                estado = "NO_JSON"
-            
-            print(f"  Respuesta   : {estado}")
-            return estado, respuesta
-            
-        except zmq.ZMQError as e:
-            print(f"  Respuesta   : TIMEOUT")
-            return "TIMEOUT", None
-            
-    except Exception as e:
-        print(f"  Error       : {e}")
-        return "ERROR", str(e)
-    finally:
-        sock.close(linger=0)
+            idx = int(frames[0])
+            respuesta = frames[-1].decode()
+        except Exception:
+            continue
+        try:
+            resp_obj = orjson.loads(respuesta)
+            estado = resp_obj.get("estado", resp_obj.get("status", "UNKNOWN"))
+        except Exception:
+            estado = "NO_JSON"
+        respuestas[idx] = (estado, respuesta)
+        pendientes.discard(idx)
+        print(f"  Prueba {idx + 1:2}  : {estado}")
+
+    for idx in pendientes:
+        respuestas[idx] = ("TIMEOUT", None)
+        print(f"  Prueba {idx + 1:2}  : TIMEOUT")
+
+    sock.close(linger=0)
+    return respuestas
 
 def test_entrada_corrupta():
     """
@@ -86,129 +107,64 @@ def test_entrada_corrupta():
     print_banner()
     
     ctx = zmq.Context()
-    resultados = []
-    
+
     # Generar solicitud válida base
     solicitud_base = make_request("RENOVACION", 123, 42)
-    
-    # TEST 1: HMAC inválido
-    print("\n" + "=" * 72)
-    print(" TEST 1: HMAC INVÁLIDO ".center(72, " "))
-    print("=" * 72)
-    
+
     solicitud_hmac = solicitud_base.copy()
     solicitud_hmac["hmac"] = "0" * 64  # HMAC falso
-    payload1 = json.dumps(solicitud_hmac)
-    
-    estado1, _ = enviar_payload(ctx, "HMAC Inválido", payload1, 
-                                 "HMAC modificado (64 ceros)")
-    resultados.append(("HMAC_invalido", estado1))
-    
-    # TEST 2: JSON malformado
-    print("\n" + "=" * 72)
-    print(" TEST 2: JSON MALFORMADO ".center(72, " "))
-    print("=" * 72)
-    
-    payload2 = '{"operation":"renovacion", "book_code":"BOOK-123", "user_id":42'  # falta cierre
-    
-    estado2, _ = enviar_payload(ctx, "JSON Malformado", payload2,
-                                 "JSON sin cerrar llave")
-    resultados.append(("JSON_malformado", estado2))
-    
-    # TEST 3: Campo 'operation' faltante
-    print("\n" + "=" * 72)
-    print(" TEST 3: CAMPO OPERATION FALTANTE ".center(72, " "))
-    print("=" * 72)
-    
+
     solicitud_sin_op = {
         "book_code": "BOOK-123",
         "user_id": 42,
         "request_id": "test-missing-op",
-        "ts": int(datetime.utcnow().timestamp()),
+        "ts": int(datetime.now(timezone.utc).timestamp()),
         "nonce": "testnonce"
     }
-    payload3 = json.dumps(solicitud_sin_op)
-    
-    estado3, _ = enviar_payload(ctx, "Sin Operation", payload3,
-                                 "Falta campo 'operation'")
-    resultados.append(("Sin_operation", estado3))
-    
-    # TEST 4: Campo 'book_code' faltante
-    print("\n" + "=" * 72)
-    print(" TEST 4: CAMPO BOOK_CODE FALTANTE ".center(72, " "))
-    print("=" * 72)
-    
+
     solicitud_sin_book = {
         "operation": "renovacion",
         "user_id": 42,
         "request_id": "test-missing-book"
     }
-    payload4 = json.dumps(solicitud_sin_book)
-    
-    estado4, _ = enviar_payload(ctx, "Sin Book Code", payload4,
-                                 "Falta campo 'book_code'")
-    resultados.append(("Sin_book_code", estado4))
-    
-    # TEST 5: user_id como string (tipo incorrecto)
-    print("\n" + "=" * 72)
-    print(" TEST 5: TIPO DE DATO INCORRECTO ".center(72, " "))
-    print("=" * 72)
-    
+
     solicitud_tipo = {
         "operation": "renovacion",
         "book_code": "BOOK-123",
         "user_id": "cuarenta y dos",  # string en lugar de int
         "request_id": "test-wrong-type"
     }
-    payload5 = json.dumps(solicitud_tipo)
-    
-    estado5, _ = enviar_payload(ctx, "user_id String", payload5,
-                                 "user_id es string en lugar de int")
-    resultados.append(("Tipo_incorrecto", estado5))
-    
-    # TEST 6: operation como número (tipo incorrecto)
-    print("\n" + "=" * 72)
-    print(" TEST 6: OPERATION COMO NÚMERO ".center(72, " "))
-    print("=" * 72)
-    
+
     solicitud_op_num = {
         "operation": 123,  # número en lugar de string
         "book_code": "BOOK-123",
         "user_id": 42
     }
-    payload6 = json.dumps(solicitud_op_num)
-    
-    estado6, _ = enviar_payload(ctx, "Operation Número", payload6,
-                                 "operation es número en lugar de string")
-    resultados.append(("Operation_numero", estado6))
-    
-    # TEST 7: Cadena vacía como JSON
-    print("\n" + "=" * 72)
-    print(" TEST 7: CADENA VACÍA ".center(72, " "))
-    print("=" * 72)
-    
-    payload7 = ""
-    
-    estado7, _ = enviar_payload(ctx, "Cadena Vacía", payload7,
-                                 "Payload vacío")
-    resultados.append(("Cadena_vacia", estado7))
-    
-    # TEST 8: JSON válido pero operación inválida
-    print("\n" + "=" * 72)
-    print(" TEST 8: OPERACIÓN INVÁLIDA ".center(72, " "))
-    print("=" * 72)
-    
+
     solicitud_op_inv = {
         "operation": "delete_all",  # operación no soportada
         "book_code": "BOOK-123",
         "user_id": 42
     }
-    payload8 = json.dumps(solicitud_op_inv)
-    
-    estado8, _ = enviar_payload(ctx, "Operación Inválida", payload8,
-                                 "operation='delete_all' no soportada")
-    resultados.append(("Operacion_invalida", estado8))
-    
+
+    # (etiqueta, payload_str, descripcion) — toda la tanda se envía junta
+    casos = [
+        ("HMAC_invalido", json.dumps(solicitud_hmac), "HMAC modificado (64 ceros)"),
+        ("JSON_malformado",
+         '{"operation":"renovacion", "book_code":"BOOK-123", "user_id":42',  # falta cierre
+         "JSON sin cerrar llave"),
+        ("Sin_operation", json.dumps(solicitud_sin_op), "Falta campo 'operation'"),
+        ("Sin_book_code", json.dumps(solicitud_sin_book), "Falta campo 'book_code'"),
+        ("Tipo_incorrecto", json.dumps(solicitud_tipo), "user_id es string en lugar de int"),
+        ("Operation_numero", json.dumps(solicitud_op_num), "operation es número en lugar de string"),
+        ("Cadena_vacia", "", "Payload vacío"),
+        ("Operacion_invalida", json.dumps(solicitud_op_inv), "operation='delete_all' no soportada"),
+    ]
+
+    respuestas = enviar_pipeline(ctx, casos)
+    resultados = [(nombre, respuestas[idx][0])
+                  for idx, (nombre, _, _) in enumerate(casos)]
+
     # Análisis de resultados
     print("\n" + "=" * 72)
     print(" RESULTADOS CONSOLIDADOS ".center(72, " "))
@@ -269,8 +225,8 @@ def test_entrada_corrupta():
     }
     
     reporte_path = Path(__file__).parent / "reporte_corrupt.json"
-    with open(reporte_path, "w") as f:
-        json.dump(reporte, f, indent=2)
+    with open(reporte_path, "wb") as f:
+        f.write(orjson.dumps(reporte, option=orjson.OPT_INDENT_2))
     
     print(f"\n📄 Reporte guardado en: {reporte_path}\n")
     
@@ -14,25 +14,41 @@ import os
 import sys
 import time
 import zmq
-import json
+import zmq.asyncio
+import orjson
+import asyncio
+import numpy as np
 from pathlib import Path
-from datetime import datetime
-import threading
-from queue import Queue
+from datetime import datetime, timezone
+
+# uvloop es opcional: si está instalado el event loop corre sobre libuv
+try:
+    import uvloop
+    uvloop.install()
+except ImportError:
+    pass
 
 # Añadir path para importar módulos del PS
 sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "ps"))
 from schema import make_request
 
+# Salida en bloque: sin un write() por línea cuando stdout va a un
+# pipe/log, los prints del flood se agrupan en el buffer de TextIO
+try:
+    sys.stdout.reconfigure(line_buffering=False, write_through=False)
+except AttributeError:
+    pass
+
 # Configuración
 GC_ADDR = os.getenv("GC_ADDR", "tcp://10.43.101.220:5555")
 NUM_SOLICITUDES = int(os.getenv("FLOOD_NUM", "100"))
-NUM_THREADS = int(os.getenv("FLOOD_THREADS", "5"))
+NUM_SOCKETS = int(os.getenv("FLOOD_SOCKETS", "16"))
+MAX_EN_VUELO = int(os.getenv("FLOOD_EN_VUELO", "64"))
 TIMEOUT_MS = 2000
 
 def iso():
     """Retorna timestamp ISO-8601."""
-    return datetime.utcnow().isoformat() + "Z"
+    return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
 
 def print_banner():
     """Imprime banner de inicio."""
@@ -41,153 +57,180 @@ def print_banner():
     print("-" * 72)
     print(f"  GC Target       : {GC_ADDR}")
     print(f"  Total Solicitudes: {NUM_SOLICITUDES}")
-    print(f"  Threads Concurrentes: {NUM_THREADS}")
+    print(f"  Sockets DEALER  : {NUM_SOCKETS}")
+    print(f"  Máx. en vuelo   : {MAX_EN_VUELO} por socket")
     print(f"  Timeout         : {TIMEOUT_MS}ms")
     print("=" * 72 + "\n")
 
-def worker_flood(thread_id, cola_trabajo, cola_resultados):
+async def flood_socket(ctx, sock_id, items, resultados):
     """
-    Worker que envía solicitudes en ráfaga desde la cola de trabajo.
+    Flood asíncrono sobre UN socket DEALER: envía su tanda con hasta
+    MAX_EN_VUELO solicitudes en vuelo y un receptor concurrente las
+    correlaciona por frame de id (el REP del GC ecoa el sobre). Un solo
+    hilo multiplexa todos los sockets vía epoll, sin Queue ni context
+    switches entre threads.
     """
-    ctx = zmq.Context()
-
-    while True:
-        try:
-            item = cola_trabajo.get(timeout=0.1)
-            if item is None:  # Señal de terminación
-                break
-
-            idx, solicitud = item
-
-            sock = ctx.socket(zmq.REQ)
-            sock.setsockopt(zmq.RCVTIMEO, TIMEOUT_MS)
-            sock.setsockopt(zmq.SNDTIMEO, TIMEOUT_MS)
-
-            start = time.time()
-            estado = "ERROR"
-
+    sock = ctx.socket(zmq.DEALER)
+    sock.setsockopt(zmq.LINGER, 0)
+    # HWM ilimitado: la ráfaga entera se encola en los buffers C de libzmq
+    # y el hilo Python nunca se bloquea esperando espacio en la cola
+    sock.setsockopt(zmq.SNDHWM, 0)
+    sock.setsockopt(zmq.RCVHWM, 0)
+    sock.connect(GC_ADDR)
+
+    loop = asyncio.get_running_loop()
+    sem = asyncio.Semaphore(MAX_EN_VUELO)
+    enviados = {}          # idx -> t0 (loop.time() justo antes del send)
+    pendientes = set()
+    vacio = asyncio.Event()   # el receptor lo marca al vaciarse la ventana
+
+    async def receptor():
+        while True:
+            # copy=False: los frames quedan como vistas sobre el buffer de
+            # libzmq, sin memcpy por mensaje
+            frames = await sock.recv_multipart(copy=False)
+            t1 = loop.time()
+            try:
+                idx = int(bytes(frames[0]))
+                t0 = enviados.pop(idx)
+            except (ValueError, KeyError):
+                continue  # frame de id no numérico o idx ya resuelto
             try:
-                sock.connect(GC_ADDR)
-                payload = json.dumps(solicitud)
-                sock.send_string(payload)
-
-                try:
-                    respuesta = sock.recv_string()
-                    resp_obj = json.loads(respuesta)
-                    estado = resp_obj.get("estado", resp_obj.get("status", "UNKNOWN"))
-                    if estado.upper() in ("OK", "OKAY"):
-                        estado = "OK"
-                except zmq.ZMQError:
-                    estado = "TIMEOUT"
-
-            except Exception as e:
-                estado = "ERROR"
-            finally:
-                sock.close(linger=0)
-
-            end = time.time()
-            latencia = end - start
-
-            cola_resultados.put({
+                resp_obj = orjson.loads(frames[-1].buffer)
+                estado = resp_obj.get("estado", resp_obj.get("status", "UNKNOWN"))
+                if estado.upper() in ("OK", "OKAY"):
+                    estado = "OK"
+            except (orjson.JSONDecodeError, AttributeError):
+                estado = "ERROR"  # respuesta no-JSON o sin campo de estado str
+            # cada idx es único: escribir el slot no compite con nadie
+            resultados[idx] = {
                 "idx": idx,
-                "thread": thread_id,
+                "socket": sock_id,
                 "estado": estado,
-                "latencia_s": latencia
-            })
+                "latencia_s": t1 - t0
+            }
+            pendientes.discard(idx)
+            if not pendientes:
+                vacio.set()
+            sem.release()
 
-        except:
-            break
+    tarea_rx = asyncio.create_task(receptor())
+    restantes = list(items)
 
-    ctx.term()
+    try:
+        while restantes:
+            try:
+                await asyncio.wait_for(sem.acquire(), TIMEOUT_MS / 1000)
+            except asyncio.TimeoutError:
+                break  # la ventana en vuelo lleva TIMEOUT_MS sin drenar
+            # payload ya viene serializado: cero trabajo json en el bucle
+            idx, payload = restantes.pop(0)
+            pendientes.add(idx)
+            enviados[idx] = loop.time()
+            await sock.send_multipart([str(idx).encode(), b"", payload],
+                                      copy=False)
+
+        # Drenaje final: despierta apenas el receptor vacía la ventana
+        # (no paga un sleep fijo dentro de la ventana medida, que
+        # deflactaba el TPS); corta tras TIMEOUT_MS sin progreso
+        while pendientes:
+            antes = len(pendientes)
+            vacio.clear()
+            try:
+                await asyncio.wait_for(vacio.wait(), TIMEOUT_MS / 1000)
+            except asyncio.TimeoutError:
+                if len(pendientes) == antes:
+                    break
+    finally:
+        tarea_rx.cancel()
+
+    for idx, _ in restantes:
+        pendientes.add(idx)
+    for idx in pendientes:
+        resultados[idx] = {
+            "idx": idx,
+            "socket": sock_id,
+            "estado": "TIMEOUT",
+            "latencia_s": TIMEOUT_MS / 1000
+        }
+
+    sock.close(linger=0)
+
+async def ejecutar_flood(solicitudes, resultados):
+    """
+    Reparte las solicitudes round-robin entre NUM_SOCKETS sockets DEALER
+    y las dispara concurrentemente con asyncio.gather.
+    """
+    ctx = zmq.asyncio.Context.instance()
+
+    shards = [solicitudes[i::NUM_SOCKETS] for i in range(NUM_SOCKETS)]
+    await asyncio.gather(*(
+        flood_socket(ctx, i + 1, shard, resultados)
+        for i, shard in enumerate(shards) if shard
+    ))
+
+    ctx.destroy(linger=0)
 
 def test_flood_attack():
     """
     Ejecuta ataque de flood:
     1. Genera NUM_SOLICITUDES solicitudes válidas
-    2. Las envía en ráfaga con NUM_THREADS threads concurrentes
+    2. Las envía concurrentemente repartidas en NUM_SOCKETS sockets DEALER
     3. Mide: TPS, % timeouts, latencias
     """
     print_banner()
 
-    # Generar solicitudes
+    # Generar y PRE-serializar las solicitudes: la firma HMAC y el dumps
+    # quedan fuera de la ventana medida, el flood sólo mueve bytes
     print(f"[{iso()}] Generando {NUM_SOLICITUDES} solicitudes...")
-    solicitudes = []
-    for i in range(NUM_SOLICITUDES):
-        sol = make_request("RENOVACION", i % 1000 + 1, i % 100 + 1)
-        solicitudes.append((i, sol))
+    solicitudes = [
+        (i, orjson.dumps(make_request("RENOVACION", i % 1000 + 1, i % 100 + 1)))
+        for i in range(NUM_SOLICITUDES)
+    ]
 
     print(f"[{iso()}] Solicitudes generadas: {len(solicitudes)}\n")
 
-    # Crear colas
-    cola_trabajo = Queue()
-    cola_resultados = Queue()
-
-    # Llenar cola de trabajo
-    for item in solicitudes:
-        cola_trabajo.put(item)
+    # Lanzar el flood: un solo hilo, miles de solicitudes en vuelo vía epoll
+    print(f"[{iso()}] Flood iniciado con {NUM_SOCKETS} sockets...\n")
 
-    # Añadir señales de terminación
-    for _ in range(NUM_THREADS):
-        cola_trabajo.put(None)
-
-    # Iniciar workers
-    print(f"[{iso()}] Iniciando {NUM_THREADS} threads de ataque...")
-    workers = []
-    for i in range(NUM_THREADS):
-        t = threading.Thread(target=worker_flood, args=(i+1, cola_trabajo, cola_resultados))
-        t.start()
-        workers.append(t)
-
-    # Monitorear progreso
+    # Slots preasignados: cada solicitud escribe resultados[idx] directo,
+    # sin Queue ni locks por resultado
+    resultados = [None] * NUM_SOLICITUDES
     inicio = time.time()
-    print(f"[{iso()}] Flood iniciado...\n")
-
-    procesadas = 0
-    while procesadas < NUM_SOLICITUDES:
-        try:
-            cola_resultados.get(timeout=0.5)
-            procesadas += 1
-            if procesadas % 20 == 0 or procesadas == NUM_SOLICITUDES:
-                elapsed = time.time() - inicio
-                tps_actual = procesadas / elapsed if elapsed > 0 else 0
-                print(f"  Procesadas: {procesadas}/{NUM_SOLICITUDES} | TPS: {tps_actual:.2f}")
-        except:
-            pass
-
+    asyncio.run(ejecutar_flood(solicitudes, resultados))
     fin = time.time()
     duracion = fin - inicio
 
-    # Esperar a que terminen todos los workers
-    for t in workers:
-        t.join(timeout=2)
-
-    # Recolectar resultados
-    resultados = []
-    while not cola_resultados.empty():
-        try:
-            resultados.append(cola_resultados.get_nowait())
-        except:
-            break
+    resultados = [r for r in resultados if r is not None]
 
     # Análisis de resultados
     print("\n" + "=" * 72)
     print(" RESULTADOS DEL FLOOD ".center(72, " "))
     print("=" * 72)
 
-    ok = sum(1 for r in resultados if r["estado"] == "OK")
-    timeouts = sum(1 for r in resultados if r["estado"] == "TIMEOUT")
-    errores = sum(1 for r in resultados if r["estado"] == "ERROR")
+    # Conteos y percentiles vectorizados: una pasada C sobre el array de
+    # estados reemplaza tres generadores Python, y el sort es de NumPy
+    estados = np.array([r["estado"] for r in resultados])
+    ok = int(np.count_nonzero(estados == "OK"))
+    timeouts = int(np.count_nonzero(estados == "TIMEOUT"))
+    errores = int(np.count_nonzero(estados == "ERROR"))
     total = len(resultados)
 
-    latencias = [r["latencia_s"] for r in resultados if r["estado"] == "OK"]
-
-    if latencias:
-        lat_min = min(latencias)
-        lat_max = max(latencias)
-        lat_mean = sum(latencias) / len(latencias)
-        latencias_sorted = sorted(latencias)
-        lat_p50 = latencias_sorted[len(latencias_sorted) // 2]
-        lat_p95 = latencias_sorted[int(len(latencias_sorted) * 0.95)] if len(latencias_sorted) > 20 else lat_max
+    lat = np.fromiter((r["latencia_s"] for r in resultados if r["estado"] == "OK"),
+                      dtype=np.float64, count=ok)
+
+    if lat.size:
+        lat_min = float(lat.min())
+        lat_max = float(lat.max())
+        lat_mean = float(lat.mean())
+        # Selección O(N) con introselect: sólo se necesitan dos estadísticos
+        # de orden, no el array completo ordenado (float() nativo porque
+        # orjson no serializa np.float64 sin opciones extra)
+        p50_idx = lat.size // 2
+        p95_idx = min(int(lat.size * 0.95), lat.size - 1)
+        lat.partition([p50_idx, p95_idx])
+        lat_p50 = float(lat[p50_idx])
+        lat_p95 = float(lat[p95_idx])
     else:
         lat_min = lat_max = lat_mean = lat_p50 = lat_p95 = 0
 
@@ -234,7 +277,8 @@ def test_flood_attack():
         "timestamp": iso(),
         "configuracion": {
             "num_solicitudes": NUM_SOLICITUDES,
-            "num_threads": NUM_THREADS,
+            "num_sockets": NUM_SOCKETS,
+            "max_en_vuelo": MAX_EN_VUELO,
             "timeout_ms": TIMEOUT_MS
         },
         "metricas": {
@@ -253,8 +297,8 @@ def test_flood_attack():
     }
 
     reporte_path = Path(__file__).parent / "reporte_flood.json"
-    with open(reporte_path, "w") as f:
-        json.dump(reporte, f, indent=2)
+    with open(reporte_path, "wb") as f:
+        f.write(orjson.dumps(reporte, option=orjson.OPT_INDENT_2))
 
     print(f"\n📄 Reporte guardado en: {reporte_path}\n")
 
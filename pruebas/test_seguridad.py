@@ -12,15 +12,44 @@
 
 import os
 import sys
-import json
-import subprocess
+import time
 from pathlib import Path
-from datetime import datetime
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
 import argparse
 
+# Pool singleton para TODA la suite: se crea una vez y cada despacho lo
+# reutiliza con los workers ya calientes. Es de hilos (no de procesos)
+# porque el aislamiento real lo da el subproceso hijo de cada test; los
+# hilos sólo esperan a que ese hijo termine.
+_POOL = None
+
+def _pool(max_workers=None):
+    """Retorna el pool compartido de la suite, creándolo en el primer uso.
+
+    max_workers sólo se honra en la creación; por defecto se shardea a
+    cores - 2 (dejando margen para la consola y el recolector de reportes).
+    """
+    global _POOL
+    if _POOL is None:
+        if max_workers is None:
+            max_workers = max(1, (os.cpu_count() or 4) - 2)
+        _POOL = ThreadPoolExecutor(max_workers=max_workers)
+    return _POOL
+
+# Caché del prefijo "YYYY-mm-ddTHH:MM:SS": strftime/gmtime sólo se
+# recalculan cuando cambia el segundo entero, no en cada registro.
+_ISO_CACHE = (None, "")
+
 def iso():
-    """Retorna timestamp ISO-8601."""
-    return datetime.utcnow().isoformat() + "Z"
+    """Retorna timestamp ISO-8601 (UTC, microsegundos)."""
+    # time_ns() evita construir un datetime por llamada; sólo los
+    # sub-segundos se formatean siempre.
+    global _ISO_CACHE
+    s, ns = divmod(time.time_ns(), 1_000_000_000)
+    if _ISO_CACHE[0] != s:
+        _ISO_CACHE = (s, time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(s)))
+    return f"{_ISO_CACHE[1]}.{ns // 1000:06d}Z"
 
 def print_banner():
     """Imprime banner de inicio."""
@@ -34,23 +63,25 @@ def print_banner():
 
 def ejecutar_test(test_name, test_path):
     """
-    Ejecuta un test individual y retorna el resultado.
+    Ejecuta un test individual en su subproceso (aislado) y retorna
+    (resultado, salida capturada). La salida se captura para poder correr
+    varios tests a la vez sin que sus consolas se entremezclen.
     """
-    print("\n" + "=" * 72)
-    print(f" EJECUTANDO: {test_name} ".center(72, " "))
-    print("=" * 72)
+    # Import diferido: subprocess sólo se paga cuando de verdad se lanza
+    # un test, no al arrancar la suite (p. ej. con --help)
+    import subprocess
 
-    start = datetime.utcnow()
+    start = datetime.now(timezone.utc)
 
     try:
         result = subprocess.run(
             [sys.executable, str(test_path)],
-            capture_output=False,
+            capture_output=True,
             text=True,
             timeout=300  # 5 minutos máximo por test
         )
 
-        end = datetime.utcnow()
+        end = datetime.now(timezone.utc)
         duracion = (end - start).total_seconds()
 
         exito = result.returncode == 0
@@ -62,33 +93,34 @@ def ejecutar_test(test_name, test_path):
             "codigo_salida": result.returncode,
             "duracion_s": duracion,
             "timestamp": iso()
-        }
+        }, result.stdout + result.stderr
 
     except subprocess.TimeoutExpired:
-        print(f"\n⚠️  TIMEOUT: {test_name} excedió el tiempo límite\n")
         return {
             "test": test_name,
             "ejecutado": False,
             "exito": False,
             "error": "TIMEOUT",
             "timestamp": iso()
-        }
+        }, f"\n⚠️  TIMEOUT: {test_name} excedió el tiempo límite\n"
     except Exception as e:
-        print(f"\n❌ ERROR ejecutando {test_name}: {e}\n")
         return {
             "test": test_name,
             "ejecutado": False,
             "exito": False,
             "error": str(e),
             "timestamp": iso()
-        }
+        }, f"\n❌ ERROR ejecutando {test_name}: {e}\n"
 
 def leer_reporte_json(reporte_path):
     """Lee un archivo de reporte JSON si existe."""
+    import orjson  # diferido: sólo se usa en la fase de reportes
+    # Sin probe .exists() previo: abrir directo y atrapar FileNotFoundError
+    # hace un solo stat/open en vez de dos (y evita la carrera entre ambos)
     try:
-        if reporte_path.exists():
-            with open(reporte_path, "r") as f:
-                return json.load(f)
+        return orjson.loads(reporte_path.read_bytes())
+    except FileNotFoundError:
+        return None
     except Exception as e:
         print(f"⚠️  No se pudo leer {reporte_path}: {e}")
     return None
@@ -99,6 +131,8 @@ def main():
                        default="all", help="Test a ejecutar (default: all)")
     parser.add_argument("--skip-slow", action="store_true",
                        help="Omitir tests lentos (replay, flood)")
+    parser.add_argument("--serial", action="store_true",
+                       help="Ejecutar los tests de a uno (depuración determinista)")
     args = parser.parse_args()
 
     print_banner()
@@ -124,9 +158,10 @@ def main():
 
     print(f"Tests a ejecutar: {', '.join(tests_a_ejecutar)}\n")
 
-    # Ejecutar tests
-    resultados_ejecucion = []
-
+    # Ejecutar tests EN PARALELO: cada test ya corre aislado en su propio
+    # subproceso, así que los hilos sólo esperan al hijo; el wall-clock de
+    # la suite baja de la suma de los tests al máximo de ellos.
+    lanzables = []
     for test_key in tests_a_ejecutar:
         if test_key not in tests_disponibles:
             print(f"⚠️  Test desconocido: {test_key}")
@@ -138,7 +173,19 @@ def main():
             print(f"⚠️  Test no encontrado: {test_path}")
             continue
 
-        resultado = ejecutar_test(test_name, test_path)
+        lanzables.append((test_name, test_path))
+
+    # Con --serial el pool queda de 1 worker: mismo código, orden estricto.
+    ex = _pool(1 if args.serial else None)
+    resultados_ejecucion = []
+    futuros = [ex.submit(ejecutar_test, nombre, ruta)
+               for nombre, ruta in lanzables]
+    for (nombre, _), futuro in zip(lanzables, futuros):
+        resultado, salida = futuro.result()
+        print("\n" + "=" * 72)
+        print(f" EJECUTADO: {nombre} ".center(72, " "))
+        print("=" * 72)
+        print(salida, end="")
         resultados_ejecucion.append(resultado)
 
     # Recolectar reportes individuales
@@ -231,42 +278,53 @@ def main():
         "fortalezas": fortalezas
     }
 
+    import orjson  # diferido: sólo se usa en la fase de reportes
+
     reporte_path = pruebas_dir / "reporte_seguridad_consolidado.json"
-    with open(reporte_path, "w") as f:
-        json.dump(reporte_consolidado, f, indent=2)
+    with open(reporte_path, "wb") as f:
+        f.write(orjson.dumps(reporte_consolidado, option=orjson.OPT_INDENT_2))
 
     print(f"\n📄 Reporte consolidado guardado en: {reporte_path}")
 
     # Generar reporte de texto
     txt_path = pruebas_dir / "reporte_seguridad.txt"
+    lineas = [
+        "=" * 72,
+        " REPORTE DE PRUEBAS DE SEGURIDAD ".center(72),
+        "=" * 72,
+        "",
+        f"Fecha: {iso()}",
+        f"Tests ejecutados: {', '.join(tests_a_ejecutar)}",
+        "",
+        "RESUMEN:",
+        f"  Total: {total_tests}",
+        f"  Exitosos: {tests_exitosos}",
+        f"  Fallidos: {tests_fallidos}",
+        "",
+    ]
+
+    if vulnerabilidades:
+        lineas.append("VULNERABILIDADES:")
+        lineas.extend(f"  - {vuln}" for vuln in vulnerabilidades)
+        lineas.append("")
+
+    if fortalezas:
+        lineas.append("FORTALEZAS:")
+        lineas.extend(f"  - {fort}" for fort in fortalezas)
+        lineas.append("")
+
+    lineas.append("=" * 72)
+
+    # El reporte se ensambla en memoria y se escribe con un único write
     with open(txt_path, "w") as f:
-        f.write("=" * 72 + "\n")
-        f.write(" REPORTE DE PRUEBAS DE SEGURIDAD ".center(72) + "\n")
-        f.write("=" * 72 + "\n\n")
-        f.write(f"Fecha: {iso()}\n")
-        f.write(f"Tests ejecutados: {', '.join(tests_a_ejecutar)}\n\n")
-
-        f.write(f"RESUMEN:\n")
-        f.write(f"  Total: {total_tests}\n")
-        f.write(f"  Exitosos: {tests_exitosos}\n")
-        f.write(f"  Fallidos: {tests_fallidos}\n\n")
-
-        if vulnerabilidades:
-            f.write("VULNERABILIDADES:\n")
-            for vuln in vulnerabilidades:
-                f.write(f"  - {vuln}\n")
-            f.write("\n")
-
-        if fortalezas:
-            f.write("FORTALEZAS:\n")
-            for fort in fortalezas:
-                f.write(f"  - {fort}\n")
-            f.write("\n")
-
-        f.write("=" * 72 + "\n")
+        f.write("\n".join(lineas) + "\n")
 
     print(f"📄 Reporte de texto guardado en: {txt_path}\n")
 
+    # Cierre ordenado del pool antes de salir
+    if _POOL is not None:
+        _POOL.shutdown(wait=True)
+
     # Código de salida
     sys.exit(0 if tests_fallidos == 0 else 1)
 
@@ -15,8 +15,8 @@
 #     - Mezcla RENOVACION:DEVOLUCION (--mix "70:30", default "50:50")
 #
 # Formato de cada elemento:
-#   dict con: request_id, tipo ("RENOVACION"|"DEVOLUCION"), book_id, user_id, ts, hmac
-#   (la HMAC igual se recalcula en el envío desde ps.py)
+#   dict con: request_id, operation, book_code, user_id, ts, nonce
+#   (SIN campo hmac: la firma la calcula ps.py en el envío)
 #
 # Uso:
 #   python ps/gen_solicitudes.py
@@ -27,11 +27,12 @@
 #   Se imprime un bloque legible con ruta del binario, resumen por tipo y parámetros usados.
 
 import os
-import pickle               # Serialización binaria sencilla (estándar de Python)
-import random
+import sys
+import msgspec.msgpack      # Serialización binaria msgpack (C, compacta y segura)
 import argparse
+import numpy as np
 from pathlib import Path    # Manejo de rutas (independiente del cwd)
-from schema import make_request  # Construye la estructura y firma HMAC de cada solicitud
+from schema import make_request_unsigned  # Estructura de cada solicitud (la firma la pone ps.py al enviar)
 
 # Calcula la ruta de la RAÍZ del repo partiendo de este archivo (ps/)
 # es decir: biblioteca-clientes/
@@ -41,30 +42,41 @@ ROOT = Path(__file__).resolve().parents[1]
 OUT = ROOT / "solicitudes.bin"
 
 
-def banner_inicio(n: int, seed, mix: str):
+def banner_inicio(n: int, seed, mix: str, out: Path):
     # Imprime encabezado legible con los parámetros de generación.
-    print("\n" + "=" * 72)
-    print(" GENERADOR DE SOLICITUDES ".center(72, " "))
-    print("-" * 72)
-    print(f"  Archivo destino : {OUT}")
-    print(f"  Cantidad (N)    : {n}")
-    print(f"  Semilla (seed)  : {seed}")
-    print(f"  Mezcla          : {mix}  (RENOVACION:DEVOLUCION:PRESTAMO)")
-    print("=" * 72 + "\n")
-
-
-def banner_resumen(n: int, seed, a: int, b: int, c: int, c_ren: int, c_dev: int, c_pres: int):
-    # Muestra un bloque de resumen final (conteo por tipo y parámetros efectivos).
-    print("-" * 72)
-    print(" RESUMEN DE GENERACIÓN ".center(72, " "))
-    print("-" * 72)
-    print(f"  Total generadas      : {n}")
-    print(f"  RENOVACION (objetivo): {a:>3}   | Generadas: {c_ren}")
-    print(f"  DEVOLUCION (objetivo): {b:>3}   | Generadas: {c_dev}")
-    print(f"  PRESTAMO   (objetivo): {c:>3}   | Generadas: {c_pres}")
-    print(f"  Semilla usada        : {seed}")
-    print(f"  Archivo              : {OUT}")
-    print("-" * 72 + "\n")
+    # El bloque se arma una vez y sale con UN write (un syscall, no ~8).
+    sys.stdout.write("\n".join((
+        "",
+        "=" * 72,
+        " GENERADOR DE SOLICITUDES ".center(72, " "),
+        "-" * 72,
+        f"  Archivo destino : {out}",
+        f"  Cantidad (N)    : {n}",
+        f"  Semilla (seed)  : {seed}",
+        f"  Mezcla          : {mix}  (RENOVACION:DEVOLUCION:PRESTAMO)",
+        "=" * 72,
+        "",
+        "",
+    )))
+
+
+def banner_resumen(n: int, seed, a: int, b: int, c: int, c_ren: int, c_dev: int, c_pres: int, out: Path):
+    # Muestra un bloque de resumen final (conteo por tipo y parámetros
+    # efectivos), también en un único write.
+    sys.stdout.write("\n".join((
+        "-" * 72,
+        " RESUMEN DE GENERACIÓN ".center(72, " "),
+        "-" * 72,
+        f"  Total generadas      : {n}",
+        f"  RENOVACION (objetivo): {a:>3}   | Generadas: {c_ren}",
+        f"  DEVOLUCION (objetivo): {b:>3}   | Generadas: {c_dev}",
+        f"  PRESTAMO   (objetivo): {c:>3}   | Generadas: {c_pres}",
+        f"  Semilla usada        : {seed}",
+        f"  Archivo              : {out}",
+        "-" * 72,
+        "",
+        "",
+    )))
 
 
 def parse_args():
@@ -78,6 +90,11 @@ def parse_args():
                    help="Semilla para reproducibilidad (mismas solicitudes)")
     p.add_argument("--mix", type=str, default="50:50:0",
                    help="Proporción RENOVACION:DEVOLUCION:PRESTAMO, ej. '40:40:20' (default '50:50:0')")
+    p.add_argument("--out", type=str, default=str(OUT),
+                   help="Ruta del archivo de salida (default: solicitudes.bin en raíz)")
+    p.add_argument("--formato", choices=["msgpack", "npz"], default="msgpack",
+                   help="Formato de salida: msgpack (fila a fila, default) o npz "
+                        "(columnar SoA, un array por campo)")
     args = p.parse_args()
 
     # N desde ENV si no viene por CLI
@@ -89,7 +106,7 @@ def parse_args():
     else:
         n = 25
 
-    return n, args.seed, args.mix
+    return n, args.seed, args.mix, Path(args.out), args.formato
 
 
 def parse_mix(mix_str: str) -> tuple[int, int, int]:
@@ -117,57 +134,74 @@ def parse_mix(mix_str: str) -> tuple[int, int, int]:
     return a, b, c
 
 
-def pick_tipo(a: int, b: int, c: int) -> str:
-    # Elige 'RENOVACION', 'DEVOLUCION' o 'PRESTAMO' según la proporción a:b:c.
-    # Implementación: sorteo en el rango [1 .. a+b+c].
-    total = a + b + c
-    r = random.randint(1, total)
-    if r <= a:
-        return "RENOVACION"
-    elif r <= a + b:
-        return "DEVOLUCION"
-    else:
-        return "PRESTAMO"
-
-
-def generar_solicitudes(n: int, seed: int | None, mix_str: str):
+def generar_solicitudes(n: int, seed: int | None, mix_str: str, out: Path = OUT,
+                        formato: str = "msgpack"):
     # Genera n solicitudes con la mezcla indicada y, si se da, con semilla fija.
-    # seed: si se especifica, setea random.seed(seed) para reproducibilidad.
+    # seed: si se especifica, alimenta default_rng(seed) para reproducibilidad.
     # mix_str: proporción 'RENOVACION:DEVOLUCION:PRESTAMO' (p. ej. 40:40:20).
-
-    if seed is not None:
-        # Fija la semilla para que la secuencia aleatoria sea determinista.
-        random.seed(seed)
+    # out: ruta de salida (permite que varios generadores corran en paralelo).
+    # formato: 'msgpack' (fila a fila) o 'npz' (columnar, un array por campo).
 
     a, b, c = parse_mix(mix_str)  # p.ej., "40:40:20" -> (40, 40, 20)
-    banner_inicio(n, seed, f"{a}:{b}:{c}")
-
-    batch = []
-    c_ren = 0   # Conteo RENOVACION generado efectivamente
-    c_dev = 0   # Conteo DEVOLUCION generado efectivamente
-    c_pres = 0  # Conteo PRESTAMO generado efectivamente
-
-    for _ in range(n):
-        tipo = pick_tipo(a, b, c)
-        # book_id y user_id en rangos sencillos (válidos para la entrega)
-        book_id = random.randint(1, 1000)
-        user_id = random.randint(1, 100)
-        batch.append(make_request(tipo, book_id, user_id))
-        if tipo == "RENOVACION":
-            c_ren += 1
-        elif tipo == "DEVOLUCION":
-            c_dev += 1
-        else:
-            c_pres += 1
-
-    # Serializa todo el lote en la RAÍZ del repo.
-    with open(OUT, "wb") as f:
-        pickle.dump(batch, f)
+    banner_inicio(n, seed, f"{a}:{b}:{c}", out)
+
+    # Sorteos vectorizados: un draw de NumPy por columna en vez de tres
+    # random.randint por solicitud (la semilla va a default_rng y la
+    # secuencia sigue siendo reproducible).
+    rng = np.random.default_rng(seed)
+    book_ids = rng.integers(1, 1001, size=n)   # rangos sencillos, válidos
+    user_ids = rng.integers(1, 101, size=n)    # para la entrega
+
+    # Selección de tipo por umbrales acumulados: r<=a RENOVACION,
+    # r<=a+b DEVOLUCION, resto PRESTAMO.
+    umbrales = np.cumsum((a, b, c))
+    draws = rng.integers(1, int(umbrales[-1]) + 1, size=n)
+    tipos_idx = np.searchsorted(umbrales, draws)
+    tipos = np.array(["RENOVACION", "DEVOLUCION", "PRESTAMO"])[tipos_idx]
+
+    # Binding local del constructor: sin lookup de global por ítem. La
+    # solicitud sigue siendo dict porque ESE es el contrato de alambre
+    # (payload JSON del ZMQ y formato msgpack del .bin). Se usa la
+    # variante SIN firma: ps.py re-firma cada solicitud al enviarla, así
+    # que calcular N HMAC-SHA256 acá era trabajo muerto.
+    # La lista se preasigna con [None]*n y se llena por índice: el tamaño
+    # final se conoce de antemano, así que no hay realloc amortizado de
+    # append/comprehension durante el llenado.
+    _make = make_request_unsigned
+    batch = [None] * n
+    for i, (tipo, book_id, user_id) in enumerate(zip(tipos, book_ids, user_ids)):
+        batch[i] = _make(str(tipo), int(book_id), int(user_id))
+
+    # Conteo por tipo generado efectivamente, en una pasada C
+    c_ren, c_dev, c_pres = (int(x) for x in np.bincount(tipos_idx, minlength=3))
+
+    # Serializa todo el lote en la ruta indicada.
+    if formato == "npz":
+        # Columnar (SoA): un array por campo. Quien sólo necesite una
+        # columna (p.ej. histograma de operation) no lee los HMAC.
+        columnas = {campo: np.array([s[campo] for s in batch])
+                    for campo in batch[0]}
+        with open(out, "wb") as f:
+            np.savez(f, **columnas)
+    else:
+        # msgpack fila a fila: más rápido y compacto que pickle, y sin
+        # ejecutar código al deserializar. El blob se codifica completo en
+        # memoria y baja a disco con UN os.write sobre un fd sin buffer de
+        # Python; posix_fallocate reserva el espacio de antemano (evita
+        # fragmentación y falla temprano si no hay disco).
+        data = msgspec.msgpack.encode(batch)
+        fd = os.open(out, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            if hasattr(os, "posix_fallocate"):
+                os.posix_fallocate(fd, 0, len(data))
+            os.write(fd, data)
+        finally:
+            os.close(fd)
 
     # Mensaje final legible (bloque)
-    banner_resumen(n, seed, a, b, c, c_ren, c_dev, c_pres)
+    banner_resumen(n, seed, a, b, c, c_ren, c_dev, c_pres, out)
 
 
 if __name__ == "__main__":
-    n, seed, mix_str = parse_args()
-    generar_solicitudes(n, seed, mix_str)
+    n, seed, mix_str, out, formato = parse_args()
+    generar_solicitudes(n, seed, mix_str, out, formato)
@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+# archivo: ps/log_parser_fast.py
+#
+# Universidad: Pontificia Universidad Javeriana
+# Materia: INTRODUCCIÓN A SISTEMAS DISTRIBUIDOS
+# Profesor: Rafael Páez Méndez
+# Integrantes: Thomas Arévalo, Santiago Mesa, Diego Castrillón
+# Fecha: 8 de octubre de 2025
+#
+# Qué hace:
+#   Kernel de parseo+agregación para ps_logs.txt pensado para logs muy
+#   grandes: camina los bytes crudos (sin decodificar ni crear objetos
+#   por línea) y acumula totales, extremos de 'start' y latencias.
+#
+#   Si Numba está instalado, el kernel se compila con @njit(cache=True)
+#   y corre como código máquina; si no, la MISMA función corre en
+#   CPython puro (más lenta pero idéntica), así que el módulo funciona
+#   en entornos mínimos.
+#
+# Uso:
+#   python ps/log_parser_fast.py --log ps_logs.txt
+#
+# Nota:
+#   Para filtros por operación u only_ok usar ps/log_parser.py; este
+#   módulo cubre la vista global (ALL), que es la cara en logs multi-GB.
+
+import argparse
+import mmap
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+# Numba es opcional: sin él, el kernel corre interpretado.
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+# Códigos ASCII usados por el escáner (el kernel no puede usar b"...")
+_NL = 10     # '\n'
+_PIPE = 124  # '|'
+_EQ = 61     # '='
+_DOT = 46    # '.'
+
+
+def _parse_and_agg(buf):
+    # Recorre el buffer completo byte a byte. Por línea espera el orden
+    # fijo del log del PS:
+    #   request_id=..|operation=..|start=..|end=..|status=..|retries=..
+    # (campos 2 y 3 son floats, el 4 es el status: O/E/T distingue
+    # OK/ERROR/TIMEOUT por el primer byte del valor).
+    # Retorna (total, ok, err, to, t_min, t_max, latencias[:total]).
+    n = buf.size
+    total = 0
+    ok = 0
+    err = 0
+    to = 0
+    t_min = 1e308
+    t_max = -1e308
+    cap = 1024
+    lat = np.empty(cap, np.float64)
+
+    i = 0
+    while i < n:
+        # límites de la línea
+        j = i
+        while j < n and buf[j] != _NL:
+            j += 1
+
+        campo = 0
+        tok_ini = i
+        start_v = -1.0
+        end_v = -1.0
+        scode = -1
+        k = i
+        while k <= j:
+            if k == j or buf[k] == _PIPE:
+                # token actual: buf[tok_ini:k]; ubicar '='
+                e = tok_ini
+                while e < k and buf[e] != _EQ:
+                    e += 1
+                if e < k:
+                    if campo == 2 or campo == 3:
+                        # atof a mano: entero.fraccion, sin signo ni exponente
+                        entero = 0.0
+                        frac = 0.0
+                        escala = 1.0
+                        con_punto = False
+                        valido = k > e + 1
+                        p = e + 1
+                        while p < k:
+                            c = buf[p]
+                            if 48 <= c <= 57:
+                                if con_punto:
+                                    escala *= 10.0
+                                    frac = frac * 10.0 + (c - 48)
+                                else:
+                                    entero = entero * 10.0 + (c - 48)
+                            elif c == _DOT and not con_punto:
+                                con_punto = True
+                            else:
+                                valido = False
+                                break
+                            p += 1
+                        if valido:
+                            v = entero + (frac / escala if con_punto else 0.0)
+                            if campo == 2:
+                                start_v = v
+                            else:
+                                end_v = v
+                    elif campo == 4:
+                        c0 = buf[e + 1] if e + 1 < k else 0
+                        if c0 == 79:      # 'O' → OK
+                            scode = 0
+                        elif c0 == 69:    # 'E' → ERROR
+                            scode = 1
+                        elif c0 == 84:    # 'T' → TIMEOUT
+                            scode = 2
+                campo += 1
+                tok_ini = k + 1
+            k += 1
+
+        if campo >= 5 and start_v >= 0.0 and end_v >= 0.0:
+            total += 1
+            if scode == 0:
+                ok += 1
+            elif scode == 1:
+                err += 1
+            elif scode == 2:
+                to += 1
+            if start_v < t_min:
+                t_min = start_v
+            if start_v > t_max:
+                t_max = start_v
+            if total > cap:
+                # crecimiento por duplicación (amortizado O(1))
+                nuevo = np.empty(cap * 2, np.float64)
+                nuevo[:cap] = lat
+                lat = nuevo
+                cap *= 2
+            lat[total - 1] = end_v - start_v
+
+        i = j + 1
+
+    return total, ok, err, to, t_min, t_max, lat[:total]
+
+
+# Con Numba el mismo cuerpo se compila a código máquina (cache en disco
+# para no pagar la compilación en cada corrida); sin Numba queda la
+# versión interpretada, funcionalmente idéntica.
+if njit is not None:
+    parse_and_agg = njit(cache=True)(_parse_and_agg)
+else:
+    parse_and_agg = _parse_and_agg
+
+
+def _scan_rango(path_str, ini, fin):
+    # Trabajador por proceso: lee SU porción del archivo (alineada a
+    # saltos de línea por el padre) y corre el mismo kernel sobre ella.
+    # Recibe la ruta y no el buffer para que el pickle entre procesos
+    # sea trivial; cada hijo paga un open/seek/read propio.
+    with open(path_str, "rb") as f:
+        f.seek(ini)
+        datos = f.read(fin - ini)
+    return parse_and_agg(np.frombuffer(datos, dtype=np.uint8))
+
+
+def _limites_por_lineas(path: Path, tam: int, jobs: int):
+    # Parte [0, tam) en 'jobs' rangos cuyos bordes caen justo después de
+    # un '\n', buscando hacia atrás desde el corte teórico; así ninguna
+    # línea queda partida entre dos trabajadores.
+    with path.open("rb") as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            cortes = [0]
+            paso = tam // jobs
+            for k in range(1, jobs):
+                objetivo = k * paso
+                nl = mm.rfind(b"\n", cortes[-1], objetivo)
+                corte = nl + 1 if nl >= 0 else cortes[-1]
+                if corte > cortes[-1]:
+                    cortes.append(corte)
+            cortes.append(tam)
+        finally:
+            mm.close()
+    return list(zip(cortes[:-1], cortes[1:]))
+
+
+def metricas_globales(path: Path, jobs: int = 1):
+    # Mapea el log a memoria, corre el kernel y arma el dict de métricas
+    # con el mismo esquema que log_parser.compute_metrics.
+    # Con jobs > 1 reparte el archivo entre procesos (rangos alineados a
+    # líneas), reduce los agregados parciales y calcula percentiles una
+    # sola vez sobre las latencias concatenadas.
+    if not path.exists():
+        raise FileNotFoundError(f"No se encontró el log en: {path}")
+    tam = path.stat().st_size
+    if tam == 0:
+        return None
+
+    if jobs > 1:
+        rangos = _limites_por_lineas(path, tam, jobs)
+        with ProcessPoolExecutor(max_workers=len(rangos)) as ex:
+            parciales = list(ex.map(_scan_rango,
+                                    [str(path)] * len(rangos),
+                                    [r[0] for r in rangos],
+                                    [r[1] for r in rangos]))
+        total = sum(p[0] for p in parciales)
+        ok = sum(p[1] for p in parciales)
+        err = sum(p[2] for p in parciales)
+        to = sum(p[3] for p in parciales)
+        t_min = min(p[4] for p in parciales)
+        t_max = max(p[5] for p in parciales)
+        lat = np.concatenate([p[6] for p in parciales]) if total else np.empty(0)
+    else:
+        with path.open("rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                buf = np.frombuffer(mm, dtype=np.uint8)
+                total, ok, err, to, t_min, t_max, lat = parse_and_agg(buf)
+            finally:
+                del buf
+                mm.close()
+
+    if not total:
+        return None
+    period = max(t_max - t_min, 1e-6)
+    if lat.size:
+        lat_mean = float(lat.mean())
+        lat_p50, lat_p95 = (float(x) for x in np.percentile(lat, [50, 95]))
+        lat_max = float(lat.max())
+    else:
+        lat_mean = lat_p50 = lat_p95 = lat_max = 0.0
+    return {
+        "total": total,
+        "ok": ok,
+        "error": err,
+        "timeout": to,
+        "period_s": period,
+        "tps": total / period,
+        "lat_mean_s": lat_mean,
+        "lat_p50_s": lat_p50,
+        "lat_p95_s": lat_p95,
+        "lat_max_s": lat_max,
+    }
+
+
+def main():
+    p = argparse.ArgumentParser(
+        description="Métricas globales del log del PS (kernel rápido)")
+    p.add_argument("--log", default=str(Path("ps_logs.txt")),
+                   help="Ruta al archivo de log (default: ./ps_logs.txt)")
+    p.add_argument("--jobs", type=int, default=1,
+                   help="Procesos para repartir el escaneo (0 = nº de CPUs; default: 1)")
+    args = p.parse_args()
+    jobs = args.jobs if args.jobs > 0 else (os.cpu_count() or 1)
+
+    # Import tardío para reusar la salida legible del parser estándar
+    from log_parser import print_metrics, print_error
+
+    log_path = Path(args.log)
+    try:
+        m = metricas_globales(log_path, jobs=jobs)
+    except FileNotFoundError as e:
+        print_error(str(e))
+        return
+    if m is None:
+        print_error("No hay datos válidos en el log.")
+        return
+    modo = "numba" if njit is not None else "python"
+    print_metrics(f"{log_path.name}-ALL-FAST ({modo})", m)
+
+
+if __name__ == "__main__":
+    main()
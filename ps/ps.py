@@ -9,7 +9,7 @@
 #
 # Qué hace:
 #   Cliente del Proceso Solicitante (PS):
-#     - Lee 'solicitudes.bin' desde la RAÍZ del repo.
+#     - Lee 'solicitudes.bin' (msgpack) desde la RAÍZ del repo.
 #     - Recalcula HMAC antes de cada envío.
 #     - Envía por ZeroMQ (REQ) al GC y espera REP con timeout.
 #     - Reintenta usando backoff exponencial configurable.
@@ -29,15 +29,18 @@
 #   - Un bloque legible por solicitud (envío/resp/reintentos).
 #   - Resumen final (OK/FALLIDOS y ruta del log).
 
+import io
 import os
+import sys
 import time
 import pickle
-import argparse
+import msgspec.msgpack
 import zmq
 import json
+import numpy as np
 from pathlib import Path
 from dotenv import load_dotenv
-from schema import sign   # Firma HMAC de cada solicitud
+from schema import canonical_solicitud, sign_raw  # Canónico + firma HMAC (mismo resultado que schema.sign)
 
 # Carga variables del archivo .env (si existe)
 load_dotenv()
@@ -47,7 +50,7 @@ GC_ADDR = os.getenv("GC_ADDR", "tcp://10.43.101.220:5555")
 
 # RAÍZ del repo (biblioteca-clientes/)
 ROOT = Path(__file__).resolve().parents[1]
-BIN_PATH = ROOT / "solicitudes.bin"       # Archivo de entrada (pickle con lista de dicts)
+BIN_PATH = ROOT / "solicitudes.bin"       # Archivo de entrada (msgpack con lista de dicts)
 LOG_PATH = ROOT / "ps_logs.txt"           # Archivo de salida (métricas)
 
 # Backoff y timeout por defecto (si no llegan por ENV/CLI)
@@ -55,6 +58,8 @@ BACKOFFS = [0.5, 1, 2, 4]
 TIMEOUT_S = 2.0
 # Permite override del path del log vía ENV o CLI
 ENV_LOG_PATH = os.getenv("PS_LOG_PATH")
+# Permite override del archivo de solicitudes vía ENV o CLI (multi_ps.py)
+ENV_INPUT_PATH = os.getenv("PS_INPUT_FILE")
 
 
 # ---------- Utilidades de impresión (salida legible) ----------
@@ -73,24 +78,35 @@ def banner_inicio(gc_addr: str, timeout_s: float, backoffs: list[float], total:
     print("=" * 72 + "\n")
 
 
+# Modo silencioso (--quiet / PS_QUIET=1): suprime los bloques por
+# solicitud en stdout (se conservan banner, resumen y el log de
+# métricas). A miles de req/s los prints dominan el tiempo de pared.
+QUIET = False
+
+_SEP = "-" * 72
+
+
 def print_bloque_envio(i: int, total: int, req: dict, intento: int):
-    # Muestra el envío con metadatos útiles.
-    print("-" * 72)
-    print(f" ENVÍO {i}/{total} (intento {intento + 1}) ".center(72, " "))
-    print("-" * 72)
-    print(f"  request_id : {req.get('request_id')}")
-    print(f"  operation  : {req.get('operation')}")
-    print(f"  book_code  : {req.get('book_code')}")
-    print(f"  user_id    : {req.get('user_id')}")
-    print("-" * 72 + "\n")
+    # Muestra el envío con metadatos útiles (una sola escritura a stdout).
+    if QUIET:
+        return
+    sys.stdout.write(
+        f"{_SEP}\n"
+        f"{f' ENVÍO {i}/{total} (intento {intento + 1}) '.center(72)}\n"
+        f"{_SEP}\n"
+        f"  request_id : {req.get('request_id')}\n"
+        f"  operation  : {req.get('operation')}\n"
+        f"  book_code  : {req.get('book_code')}\n"
+        f"  user_id    : {req.get('user_id')}\n"
+        f"{_SEP}\n\n"
+    )
 
 
 def print_bloque_respuesta(status: str, resp: dict):
-    # Intenta mostrar respuesta normalizada.
-    print("-" * 72)
-    print(" RESPUESTA DEL GC ".center(72, " "))
-    print("-" * 72)
-    print(f"  status  : {status}")
+    # Intenta mostrar respuesta normalizada (una sola escritura a stdout).
+    if QUIET:
+        return
+    partes = [_SEP, " RESPUESTA DEL GC ".center(72), _SEP, f"  status  : {status}"]
     if resp:
         # Desglosa contenido de la respuesta (si es JSON válido)
         estado = resp.get("estado")
@@ -98,28 +114,32 @@ def print_bloque_respuesta(status: str, resp: dict):
         info = resp.get("info")
         ts = resp.get("ts")
         if estado is not None:
-            print(f"  estado  : {estado}")
+            partes.append(f"  estado  : {estado}")
         if mensaje is not None:
-            print(f"  mensaje : {mensaje}")
+            partes.append(f"  mensaje : {mensaje}")
         if ts is not None:
-            print(f"  ts      : {ts}")
+            partes.append(f"  ts      : {ts}")
         if info:
-            print("  info    :")
+            partes.append("  info    :")
             for k, v in info.items():
-                print(f"    - {k}: {v}")
-    print("-" * 72 + "\n")
+                partes.append(f"    - {k}: {v}")
+    partes.append(_SEP + "\n\n")
+    sys.stdout.write("\n".join(partes))
 
 
 def print_bloque_timeout(wait: float, agotado: bool):
     # Informa timeout y, si procede, el tiempo a esperar antes del siguiente intento.
-    print("-" * 72)
-    print(" TIMEOUT DE RESPUESTA ".center(72, " "))
-    print("-" * 72)
-    if agotado:
-        print("  Tiempo agotado y no hay más reintentos disponibles.")
-    else:
-        print(f"  Reintentando luego de esperar {wait} s...")
-    print("-" * 72 + "\n")
+    if QUIET:
+        return
+    detalle = ("  Tiempo agotado y no hay más reintentos disponibles."
+               if agotado else f"  Reintentando luego de esperar {wait} s...")
+    sys.stdout.write(
+        f"{_SEP}\n"
+        f"{' TIMEOUT DE RESPUESTA '.center(72)}\n"
+        f"{_SEP}\n"
+        f"{detalle}\n"
+        f"{_SEP}\n\n"
+    )
 
 
 def print_resumen(ok: int, fail: int):
@@ -135,123 +155,345 @@ def print_resumen(ok: int, fail: int):
 
 # ---------- Lógica de negocio ----------
 
-def build_gc_payload(req: dict) -> str:
-    # Construye el payload JSON que se envía al GC.
-    # El payload incluye todos los campos de seguridad (request_id, ts, nonce, hmac)
-    # además de los campos de negocio estandarizados.
-    payload = {
-        "operation": req.get("operation"),
-        "book_code": req.get("book_code"),
-        "user_id": req.get("user_id"),
-        "request_id": req.get("request_id"),
-        "ts": req.get("ts"),
-        "nonce": req.get("nonce"),
-        "hmac": req.get("hmac"),
-    }
-    return json.dumps(payload, ensure_ascii=False)
-
-
 def cargar_solicitudes(path=BIN_PATH):
     # Abre el archivo binario y devuelve la lista de solicitudes (dicts).
+    # Acepta los tres formatos que gen_solicitudes produjo en su
+    # historia, detectados por la firma del archivo: npz columnar
+    # (firma zip 'PK'), pickle legado (0x80) y msgpack (el default).
     if not path.exists():
         raise FileNotFoundError(f"No se encontró el archivo de entrada: {path}")
     with open(path, "rb") as f:
-        return pickle.load(f)
+        raw = f.read()
+
+    if raw[:2] == b"PK":
+        # Columnar → rearmar dicts por fila. tolist() convierte cada
+        # columna completa a tipos nativos en una pasada C (necesarios
+        # para serializar el payload al enviar), en lugar del par
+        # hasattr + .item() por celda que costaba O(filas × campos)
+        # llamadas Python.
+        with np.load(io.BytesIO(raw)) as columnas:
+            campos = list(columnas.files)
+            listas = [columnas[campo].tolist() for campo in campos]
+        return [dict(zip(campos, fila)) for fila in zip(*listas)]
+
+    if raw[:1] == b"\x80":
+        # .bin legado serializado con pickle (los artefactos ya
+        # generados en el repo siguen cargando sin regenerarlos)
+        return pickle.loads(raw)
+
+    return msgspec.msgpack.decode(raw)
+
+
+# Manejador del log abierto por main para toda la corrida (un open en
+# lugar de open/close por solicitud); None cuando no hay corrida activa.
+LOG_FH = None
+
+# Formato precompilado de la línea de métricas: un solo despacho C de
+# PyUnicode_Format por solicitud, sin las ~6 concatenaciones parciales
+# del f-string multifragmento. Incluye el '\n' para que cada línea
+# salga en UNA sola llamada a write.
+_LOG_FMT = ("request_id=%s|operation=%s|start=%.6f|end=%.6f|"
+            "status=%s|retries=%d|lat=%.6f\n")
 
 
 def log_line(text: str):
-    # Escribe una línea en el archivo de log (append) usando LOG_PATH actual (puede ser override).
-    with open(LOG_PATH, "a", encoding="utf-8") as f:
-        f.write(text + "\n")
-
-
-def parse_runtime_args():
-    # Lee timeout, backoff y log file desde CLI y/o ENV.
-    parser = argparse.ArgumentParser(description="PS runtime params", add_help=False)
-    parser.add_argument("--timeout", type=float,
-                        default=float(os.getenv("PS_TIMEOUT", TIMEOUT_S)),
-                        help="Timeout de respuesta del GC en segundos")
-    parser.add_argument("--backoff", type=str,
-                        default=os.getenv("PS_BACKOFF", ",".join(map(str, BACKOFFS))),
-                        help="Secuencia de backoff en segundos, separada por comas")
-    parser.add_argument("--log-file", type=str,
-                        default=ENV_LOG_PATH or str(LOG_PATH),
-                        help="Ruta de archivo de log (override). Por defecto ps_logs.txt en raíz.")
+    # Escribe una línea YA terminada en '\n' usando el manejador abierto
+    # por main (con buffer de 64 KiB: una escritura real cada varias
+    # líneas). Fallback al append por línea si se usa fuera de main.
+    if LOG_FH is not None:
+        LOG_FH.write(text)
+    else:
+        with open(LOG_PATH, "a", encoding="utf-8") as f:
+            f.write(text)
+
+
+# Flags de CLI que llevan valor (se acepta '--flag valor' y '--flag=valor')
+_FLAGS_CON_VALOR = {"--timeout", "--backoff", "--log-file", "--input", "--pipeline"}
+
+
+def parse_runtime_args(argv=None):
+    # Lee timeout, backoff, log file, input, quiet y pipeline desde CLI
+    # y/o ENV. Parser manual: construir un ArgumentParser cuesta ~10 ms
+    # de arranque, y este proceso se lanza muchas veces por corrida
+    # (multi_ps, pruebas); para seis flags fijos basta un recorrido de
+    # sys.argv. Flags desconocidos se ignoran (como hacía
+    # parse_known_args) y valores inválidos caen a los defaults.
+    argv = sys.argv[1:] if argv is None else argv
+    vals = {}
+    quiet = os.getenv("PS_QUIET", "") == "1"
+
+    i, n = 0, len(argv)
+    while i < n:
+        tok = argv[i]
+        if tok == "--quiet":
+            quiet = True
+        elif tok.startswith("--"):
+            nombre, eq, valor = tok.partition("=")
+            if nombre in _FLAGS_CON_VALOR:
+                if not eq and i + 1 < n:
+                    i += 1
+                    valor = argv[i]
+                vals[nombre] = valor
+        i += 1
+
     try:
-        args, _ = parser.parse_known_args()
-    except SystemExit:
-        return TIMEOUT_S, BACKOFFS, str(LOG_PATH)
+        timeout = float(vals.get("--timeout", os.getenv("PS_TIMEOUT", TIMEOUT_S)))
+    except (TypeError, ValueError):
+        timeout = TIMEOUT_S
 
+    crudo = vals.get("--backoff", os.getenv("PS_BACKOFF", ""))
     try:
-        backoffs = [float(x) for x in args.backoff.split(",") if x.strip()]
-        if not backoffs:
-            backoffs = BACKOFFS
+        backoffs = [float(x) for x in crudo.split(",") if x.strip()] or BACKOFFS
     except Exception:
         backoffs = BACKOFFS
 
-    return args.timeout, backoffs, args.log_file
+    log_file = vals.get("--log-file") or ENV_LOG_PATH or str(LOG_PATH)
+    entrada = vals.get("--input") or ENV_INPUT_PATH or str(BIN_PATH)
+
+    try:
+        pipeline = max(1, int(vals.get("--pipeline", os.getenv("PS_PIPELINE", "1"))))
+    except (TypeError, ValueError):
+        pipeline = 1
+
+    return timeout, backoffs, log_file, entrada, quiet, pipeline
+
+
+def _tune_socket(sock):
+    # Opciones comunes a todos los sockets hacia el GC:
+    #  - LINGER 0: el close no retiene mensajes pendientes.
+    #  - keepalive TCP: detecta conexiones muertas en LAN (30 s de idle)
+    #    en lugar de esperar al timeout de la app.
+    #  - HWM acotado en ambos sentidos: a alto TPS evita acumular colas
+    #    gigantes en memoria si el GC se atrasa.
+    # No se usa zmq.IMMEDIATE: con el send bloqueante de REQ dejaría la
+    # solicitud colgada mientras el GC esté inalcanzable, en vez de
+    # encolar y dejar que el poll con timeout dispare el reintento.
+    # (TCP_NODELAY ya es el default de libzmq.)
+    sock.setsockopt(zmq.LINGER, 0)
+    sock.setsockopt(zmq.TCP_KEEPALIVE, 1)
+    sock.setsockopt(zmq.TCP_KEEPALIVE_IDLE, 30)
+    sock.setsockopt(zmq.SNDHWM, 1000)
+    sock.setsockopt(zmq.RCVHWM, 1000)
+
+
+def enviar_pipeline(ctx, solicitudes, timeout_s, ventana):
+    # Envío encauzado (pipeline) sobre un socket DEALER: mantiene hasta
+    # 'ventana' solicitudes en vuelo y cosecha respuestas a medida que
+    # llegan, en lugar del lockstep enviar→esperar→enviar de REQ. El
+    # RTT de la red se solapa con la preparación/firma de las
+    # siguientes solicitudes. En este modo no hay reintentos: una
+    # solicitud sin respuesta dentro del timeout se registra TIMEOUT.
+    # Devuelve (ok, fail).
+    sock = ctx.socket(zmq.DEALER)
+    _tune_socket(sock)
+    sock.connect(GC_ADDR)
+    poller = zmq.Poller()
+    poller.register(sock, zmq.POLLIN)
+
+    total = len(solicitudes)
+    timeout_ms = int(timeout_s * 1000)
+    # request_id → (start, t0, operation); dict ordenado por inserción,
+    # así el más viejo queda primero para expirar y para el match FIFO.
+    pendientes = {}
+    ok = fail = 0
+    idx = 0
+
+    def _cerrar(rid, status, datos):
+        nonlocal ok, fail
+        start, t0_ns, operation = datos
+        dt = (time.perf_counter_ns() - t0_ns) * 1e-9
+        log_line(_LOG_FMT % (rid, operation, start, start + dt, status, 0, dt))
+        if status == "OK":
+            ok += 1
+        else:
+            fail += 1
+
+    try:
+        while idx < total or pendientes:
+            # Llenar la ventana
+            while idx < total and len(pendientes) < ventana:
+                req = solicitudes[idx]
+                idx += 1
+                raw = canonical_solicitud(req)
+                mac = sign_raw(raw)
+                req["hmac"] = mac
+                wire = raw[:-1] + b',"hmac":"' + mac.encode("ascii") + b'"}'
+                rid = req["request_id"]
+                print_bloque_envio(idx, total, req, 0)
+                pendientes[rid] = (time.time(), time.perf_counter_ns(), req["operation"])
+                # Frame vacío delante del cuerpo: DEALER debe emular el
+                # sobre que REQ agrega solo, para hablar con el REP/ROUTER
+                sock.send_multipart([b"", wire], copy=False)
+
+            # Cosechar lo que haya llegado
+            if poller.poll(timeout_ms):
+                while True:
+                    try:
+                        frames = sock.recv_multipart(zmq.DONTWAIT)
+                    except zmq.Again:
+                        break
+                    cuerpo = frames[-1]
+                    try:
+                        resp = json.loads(cuerpo)
+                    except Exception:
+                        resp = {}
+                    status = resp.get("status")
+                    if not status:
+                        estado = str(resp.get("estado", "")).upper() if resp else ""
+                        status = "OK" if estado in ("OK", "OKAY", "SUCCESS") else "ERROR"
+                    # Correlación por request_id si el GC lo ecoa; si no,
+                    # FIFO (REP atiende en orden) → el pendiente más viejo
+                    rid = resp.get("request_id")
+                    if rid not in pendientes:
+                        rid = next(iter(pendientes), None)
+                    if rid is None:
+                        continue  # respuesta sin pendiente (tardía ya expirada)
+                    print_bloque_respuesta(status, resp)
+                    _cerrar(rid, status, pendientes.pop(rid))
+
+            # Expirar pendientes que agotaron el timeout
+            ahora_ns = time.perf_counter_ns()
+            timeout_ns = timeout_ms * 1_000_000
+            vencidos = [rid for rid, (_, t0_ns, _) in pendientes.items()
+                        if ahora_ns - t0_ns >= timeout_ns]
+            for rid in vencidos:
+                print_bloque_timeout(wait=0.0, agotado=True)
+                _cerrar(rid, "TIMEOUT", pendientes.pop(rid))
+    finally:
+        try:
+            sock.close(linger=0)
+        except Exception:
+            pass
+
+    return ok, fail
 
 
 def main():
-    global LOG_PATH  # permitirá cambiar el path del log si se pasa por CLI/ENV
+    global LOG_PATH, LOG_FH, QUIET  # permitirá cambiar el path del log si se pasa por CLI/ENV
     ctx = zmq.Context()
     sock = ctx.socket(zmq.REQ)
-    sock.setsockopt(zmq.LINGER, 0)
+    _tune_socket(sock)
+    # REQ relajado + correlacionado: permite volver a enviar sin haber
+    # recibido la respuesta anterior (sin el lockstep estricto de REQ)
+    # y descarta respuestas tardías que no correspondan al último envío.
+    # Así el reintento reusa la MISMA conexión TCP caliente en vez de
+    # pagar close + reconexión (handshake) por cada timeout.
+    sock.setsockopt(zmq.REQ_RELAXED, 1)
+    sock.setsockopt(zmq.REQ_CORRELATE, 1)
     sock.connect(GC_ADDR)
 
-    # Lee timeout/backoff y log_path efectivos (CLI/ENV)
-    timeout_s, backoffs, log_path_override = parse_runtime_args()
+    # Poller construido UNA vez para toda la corrida (sock.poll crea y
+    # registra un Poller interno en cada llamada).
+    poller = zmq.Poller()
+    poller.register(sock, zmq.POLLIN)
+
+    # Lee timeout/backoff, log_path, input, quiet y pipeline efectivos (CLI/ENV)
+    timeout_s, backoffs, log_path_override, input_override, QUIET, pipeline_k = parse_runtime_args()
+    timeout_ms = int(timeout_s * 1000)  # invariante; el Poller espera en ms
     LOG_PATH = Path(log_path_override)  # aplica override
 
+    # Un solo open del log para toda la corrida, con buffer grande:
+    # N opens + N flushes pasan a 1 open + escrituras cada 64 KiB.
+    LOG_FH = open(LOG_PATH, "a", encoding="utf-8", buffering=1 << 16)
+
     try:
-        solicitudes = cargar_solicitudes()
+        solicitudes = cargar_solicitudes(Path(input_override))
         total = len(solicitudes)
         banner_inicio(GC_ADDR, timeout_s, backoffs, total)
 
+        if pipeline_k > 1:
+            # Modo pipeline: DEALER con hasta K solicitudes en vuelo
+            ok, fail = enviar_pipeline(ctx, solicitudes, timeout_s, pipeline_k)
+            print_resumen(ok, fail)
+            return
+
         ok, fail = 0, 0
+        n_backoffs = len(backoffs)  # invariante de toda la corrida
 
         for i, req in enumerate(solicitudes, start=1):
-            # Recalcula la firma HMAC antes de enviar (por si cambió SECRET_KEY)
-            req["hmac"] = sign(req)
-
+            # Recalcula la firma HMAC antes de enviar (por si cambió SECRET_KEY).
+            # Una sola serialización por solicitud: los bytes canónicos
+            # que se firman son también el payload de red — sólo se
+            # empalma el campo hmac antes del '}' de cierre. El GC
+            # verifica re-canonizando los campos, no sobre el orden del
+            # JSON recibido.
+            raw = canonical_solicitud(req)
+            mac = sign_raw(raw)
+            req["hmac"] = mac
+
+            # Invariantes del ciclo de reintentos: el payload es idéntico
+            # para todos los intentos de la misma solicitud, y los campos
+            # del log no cambian — se calculan una sola vez acá.
+            wire = raw[:-1] + b',"hmac":"' + mac.encode("ascii") + b'"}'
+            rid = req["request_id"]
+            operation = req["operation"]
+
+            # Reloj de pared para ubicar la solicitud en el tiempo (TPS) y
+            # perf_counter_ns para la latencia: monotónico, inmune a
+            # saltos de NTP, y la lectura entera en ns evita el armado
+            # del float hasta el momento de loguear.
             start = time.time()
+            t0_ns = time.perf_counter_ns()
             attempt = 0
             status = "TIMEOUT"
 
             # Envío con reintentos (backoff exponencial)
-            while attempt <= len(backoffs):
+            while attempt <= n_backoffs:
                 # Bloque de envío legible
                 print_bloque_envio(i, total, req, attempt)
 
-                wire = build_gc_payload(req)
                 try:
-                    sock.send_string(wire)
+                    sock.send(wire, copy=False)
                 except zmq.ZMQError:
-                    # Estado REQ inválido, recrear socket y reintentar en el próximo ciclo
+                    # Error real de envío (con REQ_RELAXED ya no hay EFSM
+                    # por lockstep): recrear socket y reintentar
                     try:
                         sock.close(linger=0)
                     except Exception:
                         pass
                     sock = ctx.socket(zmq.REQ)
-                    sock.setsockopt(zmq.LINGER, 0)
+                    _tune_socket(sock)
+                    sock.setsockopt(zmq.REQ_RELAXED, 1)
+                    sock.setsockopt(zmq.REQ_CORRELATE, 1)
                     sock.connect(GC_ADDR)
+                    # el Poller sigue apuntando al socket viejo: renovarlo
+                    poller = zmq.Poller()
+                    poller.register(sock, zmq.POLLIN)
                     # espera mínima antes de próxima iteración
                     time.sleep(0.01)
 
-                # Espera respuesta del GC dentro del timeout (poll en ms)
-                if sock.poll(int(timeout_s * 1000), zmq.POLLIN):
-                    # RECEPCIÓN como STRING y normalización de status
-                    raw = sock.recv_string()
-                    try:
-                        resp = json.loads(raw)
-                    except Exception:
+                # Recepción: primero un recv no bloqueante — si la
+                # respuesta ya está encolada en el socket se ahorra el
+                # poll entero — y si no hay nada, espera en el Poller
+                # compartido dentro del timeout (en ms).
+                try:
+                    raw = sock.recv(zmq.DONTWAIT)
+                except zmq.Again:
+                    raw = sock.recv() if poller.poll(timeout_ms) else None
+
+                if raw is not None:
+                    # Normalización de status sobre los BYTES recibidos.
+                    # Camino rápido: la respuesta típica del GC es
+                    # {"estado":"ok",...}; detectar el patrón en bytes
+                    # (plegado a minúsculas, cubre también "status" y
+                    # variantes de casing tipo "OK") evita el json.loads
+                    # por solicitud en el caso común.
+                    rawl = raw.lower()
+                    if (b'"estado":"ok"' in rawl or b'"estado": "ok"' in rawl
+                            or b'"status":"ok"' in rawl or b'"status": "ok"' in rawl):
+                        status = "OK"
                         resp = {}
-
-                    # Ellos suelen usar {"estado":"ok"}; normalizamos a "OK"/"ERROR"
-                    status = resp.get("status")
-                    if not status:
-                        estado = str(resp.get("estado", "")).upper() if resp else ""
-                        status = "OK" if estado in ("OK", "OKAY", "SUCCESS") else "ERROR"
+                    else:
+                        try:
+                            resp = json.loads(raw)
+                        except Exception:
+                            resp = {}
+
+                        # Ellos suelen usar {"estado":"ok"}; normalizamos a "OK"/"ERROR"
+                        status = resp.get("status")
+                        if not status:
+                            estado = str(resp.get("estado", "")).upper() if resp else ""
+                            status = "OK" if estado in ("OK", "OKAY", "SUCCESS") else "ERROR"
 
                     print_bloque_respuesta(status, resp)
 
@@ -261,53 +503,56 @@ def main():
 
                 else:
                     # Timeout: aplica backoff o falla definitivo. Reparar socket antes de próximo send
-                    if attempt == len(backoffs):
+                    if attempt == n_backoffs:
                         print_bloque_timeout(wait=0.0, agotado=True)
                         fail += 1
                         break
                     wait = backoffs[attempt]
                     print_bloque_timeout(wait=wait, agotado=False)
-                    # Cerrar y recrear socket para evitar estado REQ bloqueado
-                    try:
-                        sock.close(linger=0)
-                    except Exception:
-                        pass
-                    sock = ctx.socket(zmq.REQ)
-                    sock.setsockopt(zmq.LINGER, 0)
-                    sock.connect(GC_ADDR)
+                    # Con REQ_RELAXED el próximo send es válido sin haber
+                    # recibido; REQ_CORRELATE descarta solo cualquier
+                    # respuesta tardía del intento anterior. Se drena lo
+                    # pendiente sin bloquear (defensivo) y se conserva la
+                    # conexión TCP en lugar de cerrarla y rehacerla.
+                    while poller.poll(0):
+                        sock.recv(zmq.DONTWAIT)
                     time.sleep(wait)
                     attempt += 1
 
-            end = time.time()
+            # Latencia por diferencia de perf_counter; 'end' se deriva de
+            # ella para que end-start del parser dé exactamente la
+            # latencia monotónica (y se emite lat= explícito al final,
+            # campo nuevo que los parsers por clave ignoran sin romperse)
+            dt = (time.perf_counter_ns() - t0_ns) * 1e-9
+            end = start + dt
 
             # Guarda métricas por solicitud (formato estable para el parser)
-            log_line(
-                f"request_id={req['request_id']}|"
-                f"operation={req['operation']}|"
-                f"start={start:.6f}|end={end:.6f}|"
-                f"status={status}|retries={attempt}"
-            )
-
-            if status == "TIMEOUT" and attempt == len(backoffs):
+            log_line(_LOG_FMT % (rid, operation, start, end, status, attempt, dt))
+
+            if status == "TIMEOUT" and attempt == n_backoffs:
                 # Asegurar que operación exista y request_id para parser
-                if not req.get("operation"):
-                    req["operation"] = "renovacion"
-                if not req.get("request_id"):
-                    req["request_id"] = f"synthetic_{i}"
+                if not operation:
+                    operation = "renovacion"
+                if not rid:
+                    rid = f"synthetic_{i}"
 
                 # Guarda línea sintética en el log (para que el parser no falle)
-                log_line(
-                    f"request_id={req['request_id']}|"
-                    f"operation={req['operation']}|"
-                    f"start={start:.6f}|end={end:.6f}|"
-                    f"status={status}|retries={attempt}"
-                )
+                log_line(_LOG_FMT % (rid, operation, start, end, status, attempt, dt))
 
         # Resumen final legible
         print_resumen(ok, fail)
 
     finally:
-        # Cierre ordenado de recursos
+        # Cierre ordenado de recursos: drenar explícitamente el buffer
+        # del log antes de cerrar (close también drena, pero así el
+        # flush queda visible y un fallo de escritura no se pierde
+        # silenciosamente dentro del close)
+        try:
+            LOG_FH.flush()
+            LOG_FH.close()
+        except Exception:
+            pass
+        LOG_FH = None
         try:
             sock.close(linger=0)
         finally:
@@ -27,15 +27,27 @@
 #   - Resumen final
 
 import os
+import sys
 import pickle
 import time
 import json
 import argparse
 from pathlib import Path
 
+import msgspec.msgpack
+
 import zmq
 from dotenv import load_dotenv
 
+# orjson (C) para serializar el dialecto compat; fallback al json
+# estándar produciendo igualmente bytes.
+try:
+    import orjson
+    _dumps = orjson.dumps
+except ImportError:
+    def _dumps(obj):
+        return json.dumps(obj, ensure_ascii=False).encode()
+
 # ---------- Rutas ----------
 ROOT = Path(__file__).resolve().parents[1]
 BIN_PATH = ROOT / "solicitudes.bin"
@@ -47,6 +59,14 @@ GC_ADDR = os.getenv("GC_ADDR", "tcp://10.43.101.220:5555")
 
 # ---------- Utilidades de impresión (salida legible) ----------
 
+# Modo silencioso (--quiet / PS_QUIET=1): suprime los bloques por
+# solicitud (quedan banner y resumen); a miles de solicitudes los
+# write() por print dominan el tiempo de pared.
+QUIET = False
+
+_SEP = "-" * 72
+
+
 def banner_inicio(gc_addr: str, timeout_s: float, total: int | None):
     # Encabezado de inicio con parámetros efectivos.
     print("\n" + "=" * 72)
@@ -61,48 +81,58 @@ def banner_inicio(gc_addr: str, timeout_s: float, total: int | None):
 
 
 def print_bloque_envio(i: int, total: int, req: dict):
-    # Muestra los campos relevantes que se mapearán a JSON.
-    print("-" * 72)
-    print(f" ENVÍO {i}/{total} ".center(72, " "))
-    print("-" * 72)
-    print(f"  request_id : {req.get('request_id')}")
-    print(f"  tipo       : {req.get('tipo')}")
-    print(f"  book_id    : {req.get('book_id')}")
-    print(f"  user_id    : {req.get('user_id')}")
-    print("-" * 72 + "\n")
+    # Muestra los campos relevantes que se mapearán a JSON
+    # (una sola escritura a stdout).
+    if QUIET:
+        return
+    sys.stdout.write(
+        f"{_SEP}\n"
+        f"{f' ENVÍO {i}/{total} '.center(72)}\n"
+        f"{_SEP}\n"
+        f"  request_id : {req.get('request_id')}\n"
+        f"  tipo       : {req.get('tipo') or req.get('operation')}\n"
+        f"  book_id    : {req.get('book_id') or req.get('book_code')}\n"
+        f"  user_id    : {req.get('user_id')}\n"
+        f"{_SEP}\n\n"
+    )
 
 
 def print_bloque_respuesta(status: str, resp: dict | None):
-    # Bloque legible con la respuesta del GC (si es parseable).
-    print("-" * 72)
-    print(" RESPUESTA DEL GC ".center(72, " "))
-    print("-" * 72)
-    print(f"  status  : {status}")
+    # Bloque legible con la respuesta del GC (si es parseable),
+    # en una sola escritura a stdout.
+    if QUIET:
+        return
+    partes = [_SEP, " RESPUESTA DEL GC ".center(72), _SEP, f"  status  : {status}"]
     if isinstance(resp, dict) and resp:
         estado = resp.get("estado")
         mensaje = resp.get("mensaje")
         info = resp.get("info")
         ts = resp.get("ts")
         if estado is not None:
-            print(f"  estado  : {estado}")
+            partes.append(f"  estado  : {estado}")
         if mensaje is not None:
-            print(f"  mensaje : {mensaje}")
+            partes.append(f"  mensaje : {mensaje}")
         if ts is not None:
-            print(f"  ts      : {ts}")
+            partes.append(f"  ts      : {ts}")
         if info:
-            print("  info    :")
+            partes.append("  info    :")
             for k, v in info.items():
-                print(f"    - {k}: {v}")
-    print("-" * 72 + "\n")
+                partes.append(f"    - {k}: {v}")
+    partes.append(_SEP + "\n\n")
+    sys.stdout.write("\n".join(partes))
 
 
 def print_bloque_timeout(timeout_s: float):
     # Informa un timeout de respuesta para la solicitud actual.
-    print("-" * 72)
-    print(" TIMEOUT DE RESPUESTA ".center(72, " "))
-    print("-" * 72)
-    print(f"  No se recibió respuesta en {timeout_s} s.")
-    print("-" * 72 + "\n")
+    if QUIET:
+        return
+    sys.stdout.write(
+        f"{_SEP}\n"
+        f"{' TIMEOUT DE RESPUESTA '.center(72)}\n"
+        f"{_SEP}\n"
+        f"  No se recibió respuesta en {timeout_s} s.\n"
+        f"{_SEP}\n\n"
+    )
 
 
 def print_resumen(ok: int, fail: int):
@@ -115,73 +145,315 @@ def print_resumen(ok: int, fail: int):
     print("=" * 72 + "\n")
 
 
+# Estados del GC que cuentan como éxito (normalizados a MAYÚSCULAS);
+# frozenset a nivel de módulo para no rearmar la tupla por respuesta.
+_OK_STATES = frozenset({"OK", "OKAY", "SUCCESS"})
+
+
 # ---------- Lógica ----------
 
 def cargar_solicitudes(path=BIN_PATH):
-    # Lee el archivo binario y retorna una lista de dicts.
+    # Lee el archivo binario y retorna una lista de dicts. Acepta los
+    # tres formatos que gen_solicitudes produjo en su historia,
+    # detectados por la firma del archivo: npz columnar ('PK'), pickle
+    # legado (0x80) y msgpack (el formato actual, decodificado en una
+    # pasada C por msgspec — no hace falta streaming: el blob entero
+    # se convierte más rápido de lo que tarda una lectura por registro).
     if not path.exists():
         raise FileNotFoundError(f"No se encontró {path}. Genere primero con ps/gen_solicitudes.py")
     with open(path, "rb") as f:
-        return pickle.load(f)
+        raw = f.read()
+
+    if raw[:2] == b"PK":
+        # npz columnar → rearmar dicts por fila con tipos nativos
+        import io
+        import numpy as np
+        with np.load(io.BytesIO(raw)) as columnas:
+            campos = list(columnas.files)
+            listas = [columnas[campo].tolist() for campo in campos]
+        return [dict(zip(campos, fila)) for fila in zip(*listas)]
+
+    if raw[:1] == b"\x80":
+        return pickle.loads(raw)
+
+    return msgspec.msgpack.decode(raw)
+
+def payload_compat(req: dict) -> dict:
+    # Mapea el payload interno del PS al "dialecto GC". Acepta tanto el
+    # esquema legado (tipo/book_id) como el estandarizado que emite el
+    # generador actual (operation/book_code, ya normalizados).
+    oper = req.get("operation") or str(req.get("tipo", "")).strip().lower()
+    book_code = req.get("book_code") or f"BOOK-{req.get('book_id')}"
+    return {"operation": oper, "book_code": book_code, "user_id": req.get("user_id")}
+
+
+# Prefijos del wire GC pre-serializados por operación: todo hasta el
+# valor de book_code ya está codificado, sólo se concatenan los campos
+# variables. Operaciones fuera del cache caen al encoder genérico.
+_OPER_CACHE = {
+    op: b'{"operation":"' + op.encode("ascii") + b'","book_code":"'
+    for op in ("renovacion", "devolucion", "prestamo")
+}
+
+
+def to_json_bytes(req: dict) -> bytes:
+    # Serializa el dialecto GC directo a bytes: el recv_string() del GC
+    # recibe los mismos bytes UTF-8 que producía send_string. Para las
+    # tres operaciones conocidas con book_code ASCII simple y user_id
+    # entero, el wire se arma concatenando el prefijo pre-serializado de
+    # _OPER_CACHE (sin dict intermedio ni encoder); cualquier otro caso
+    # — operación rara, user_id string, book_code con comillas — usa el
+    # camino genérico de siempre (orjson/json sobre payload_compat).
+    oper = req.get("operation") or str(req.get("tipo", "")).strip().lower()
+    pre = _OPER_CACHE.get(oper)
+    if pre is not None:
+        book_code = req.get("book_code") or f"BOOK-{req.get('book_id')}"
+        user_id = req.get("user_id")
+        if (type(user_id) is int and type(book_code) is str
+                and book_code.isascii()
+                and '"' not in book_code and "\\" not in book_code):
+            return (pre + book_code.encode("ascii")
+                    + b'","user_id":' + str(user_id).encode("ascii") + b"}")
+    return _dumps(payload_compat(req))
+
+def tune_socket(s):
+    # Opciones comunes de los sockets hacia el GC (mismo criterio que
+    # ps.py): LINGER 0 para que el close no retenga mensajes, keepalive
+    # TCP para detectar conexiones muertas en LAN, y HWM acotado en
+    # ambos sentidos para no acumular colas gigantes si el GC se
+    # atrasa. No se usa zmq.IMMEDIATE: con send bloqueante dejaría la
+    # solicitud colgada mientras el GC esté inalcanzable. (TCP_NODELAY
+    # ya es el default de libzmq.)
+    s.setsockopt(zmq.LINGER, 0)
+    s.setsockopt(zmq.TCP_KEEPALIVE, 1)
+    s.setsockopt(zmq.TCP_KEEPALIVE_IDLE, 30)
+    s.setsockopt(zmq.SNDHWM, 1000)
+    s.setsockopt(zmq.RCVHWM, 1000)
 
-def to_json_string(req: dict) -> str:
-    # Mapea el payload interno del PS al "dialecto GC" (JSON → string).
-    oper = str(req.get("tipo", "")).strip().lower()   # 'RENOVACION' → 'renovacion'
-    book_code = f"BOOK-{req.get('book_id')}"
-    user_id = req.get("user_id")
-    payload = {"operation": oper, "book_code": book_code, "user_id": user_id}
-    return json.dumps(payload, ensure_ascii=False)
 
 def parse_args():
     ap = argparse.ArgumentParser(description="Sender compatible (JSON string) hacia GC")
     ap.add_argument("--timeout", type=float, default=float(os.getenv("PS_TIMEOUT", 2.0)),
                     help="Timeout de espera de respuesta (segundos)")
+    ap.add_argument("--pipeline", type=int, default=int(os.getenv("PS_PIPELINE", "1")),
+                    help="Solicitudes en vuelo simultáneas (>1 usa DEALER sin lockstep; 1 = REQ clásico)")
+    ap.add_argument("--quiet", action="store_true",
+                    default=os.getenv("PS_QUIET", "") == "1",
+                    help="Suprime los bloques por solicitud en stdout (quedan banner y resumen)")
+    ap.add_argument("--persistent", action="store_true",
+                    help="Modo persistente: lee rutas de lotes por stdin (una por línea) "
+                         "y las envía reusando el mismo socket, sin re-arrancar el proceso")
     return ap.parse_args()
 
+
+def enviar_pipeline(ctx, batch, timeout_s, ventana):
+    # Envío encauzado sobre DEALER: hasta 'ventana' solicitudes en
+    # vuelo, cosechando respuestas a medida que llegan en lugar del
+    # lockstep enviar→esperar→enviar de REQ (el RTT se solapa entre
+    # solicitudes). El payload agrega request_id como id de correlación
+    # de aplicación (el GC lo ignora si no lo usa); si la respuesta no
+    # lo ecoa, se asume FIFO (REP atiende en orden). Sin respuesta
+    # dentro del timeout la solicitud se cuenta como fallida.
+    # Devuelve (ok, fail).
+    s = ctx.socket(zmq.DEALER)
+    tune_socket(s)
+    s.connect(GC_ADDR)
+    poller = zmq.Poller()
+    poller.register(s, zmq.POLLIN)
+
+    total = len(batch)
+    timeout_ms = int(timeout_s * 1000)
+    pendientes = {}   # request_id → t0_ns (orden de inserción = FIFO)
+    # Contadores sin branch: counts[0]=OK, counts[1]=fallidas; el bool
+    # del status indexa directo en la lista.
+    counts = [0, 0]
+    idx = 0
+    timeout_ns = timeout_ms * 1_000_000
+
+    try:
+        while idx < total or pendientes:
+            while idx < total and len(pendientes) < ventana:
+                req = batch[idx]
+                idx += 1
+                print_bloque_envio(idx, total, req)
+                rid = str(req.get("request_id") or f"compat-{idx}")
+                payload = payload_compat(req)
+                payload["request_id"] = rid
+                pendientes[rid] = time.perf_counter_ns()
+                # Frame vacío delante del cuerpo: DEALER emula el sobre
+                # que REQ agrega solo, para hablar con el REP/ROUTER
+                s.send_multipart([b"", _dumps(payload)])
+
+            if poller.poll(timeout_ms):
+                while True:
+                    try:
+                        frames = s.recv_multipart(zmq.NOBLOCK)
+                    except zmq.Again:
+                        break
+                    try:
+                        r = json.loads(frames[-1])
+                    except Exception:
+                        r = {}
+                    status = r.get("status")
+                    if not status:
+                        estado = str(r.get("estado", "")).upper() if r else ""
+                        status = "OK" if estado in _OK_STATES else "ERROR"
+                    rid = r.get("request_id")
+                    if rid not in pendientes:
+                        rid = next(iter(pendientes), None)
+                    if rid is None:
+                        continue   # respuesta tardía de una ya expirada
+                    pendientes.pop(rid)
+                    print_bloque_respuesta(status, r)
+                    counts[status != "OK"] += 1
+
+            # Expira las que agotaron el timeout
+            ahora_ns = time.perf_counter_ns()
+            vencidas = [rid for rid, t0 in pendientes.items()
+                        if ahora_ns - t0 >= timeout_ns]
+            for rid in vencidas:
+                pendientes.pop(rid)
+                print_bloque_timeout(timeout_s)
+                counts[1] += 1
+    finally:
+        try:
+            s.close(linger=0)
+        except Exception:
+            pass
+
+    return counts[0], counts[1]
+
+def run_batch(s, batch, timeout_s):
+    # Envía un lote completo por el socket REQ ya conectado y devuelve
+    # (ok, fail). Separado de main() para que el modo persistente pueda
+    # reusar el mismo socket entre lotes.
+    total = len(batch)
+    # Contadores sin branch: counts[0]=OK, counts[1]=fallidas
+    counts = [0, 0]
+
+    for i, req in enumerate(batch, start=1):
+        print_bloque_envio(i, total, req)
+
+        wire = to_json_bytes(req)      # JSON → bytes
+        s.send(wire)                   # su GC usa recv_string(): mismos bytes
+
+        # Recepción con NOBLOCK primero: en LAN la respuesta suele estar
+        # ya encolada y se evita armar/desarmar el poll del timeout
+        # completo; si no está, se espera en tramos cortos contra una
+        # deadline monotónica (mismo timeout efectivo que antes).
+        deadline = time.monotonic() + timeout_s
+        raw = None
+        while True:
+            try:
+                raw = s.recv_string(zmq.NOBLOCK)
+                break
+            except zmq.Again:
+                if time.monotonic() >= deadline:
+                    break
+                s.poll(5, zmq.POLLIN)
+
+        if raw is not None:
+            try:
+                r = json.loads(raw)
+            except Exception:
+                r = {}
+            # Su GC responde {"estado":"ok"} → normalizamos a OK/ERROR
+            status = r.get("status")
+            if not status:
+                estado = str(r.get("estado", "")).upper() if r else ""
+                status = "OK" if estado in _OK_STATES else "ERROR"
+            print_bloque_respuesta(status, r)
+            counts[status != "OK"] += 1
+        else:
+            print_bloque_timeout(timeout_s)
+            counts[1] += 1
+
+    return counts[0], counts[1]
+
+
+# Cache de lotes parseados por ruta, invalidado por mtime: en modo
+# persistente el mismo archivo suele repetirse entre rondas y el parseo
+# sólo se paga cuando el contenido cambió.
+_BATCH_CACHE = {}
+
+
+def _cargar_cacheado(path: Path):
+    mt = path.stat().st_mtime_ns
+    ent = _BATCH_CACHE.get(str(path))
+    if ent is None or ent[0] != mt:
+        ent = (mt, cargar_solicitudes(path))
+        _BATCH_CACHE[str(path)] = ent
+    return ent[1]
+
+
 def main():
+    global QUIET
     args = parse_args()
+    QUIET = args.quiet
+
+    if args.persistent:
+        # Modo persistente: contexto y socket se crean UNA vez y cada
+        # línea de stdin es la ruta de un lote a enviar por el mismo
+        # socket (se evita el connect/handshake TCP y el arranque del
+        # intérprete por lote). Línea vacía o archivo inexistente se
+        # reporta y se sigue esperando la próxima.
+        ctx = zmq.Context()
+        s = ctx.socket(zmq.REQ)
+        tune_socket(s)
+        s.setsockopt(zmq.REQ_RELAXED, 1)
+        s.setsockopt(zmq.REQ_CORRELATE, 1)
+        s.connect(GC_ADDR)
+        banner_inicio(GC_ADDR, args.timeout, None)
+        try:
+            for linea in sys.stdin:
+                ruta = linea.strip()
+                if not ruta:
+                    continue
+                try:
+                    batch = _cargar_cacheado(Path(ruta))
+                except (FileNotFoundError, OSError) as e:
+                    print(f"[send_compat] lote omitido: {e}", file=sys.stderr)
+                    continue
+                ok, fail = run_batch(s, batch, args.timeout)
+                print_resumen(ok, fail)
+        finally:
+            try:
+                s.close(linger=0)
+            finally:
+                ctx.term()
+        return
 
     # Carga solicitudes
     batch = cargar_solicitudes()
     total = len(batch)
 
+    if args.pipeline > 1:
+        # Modo pipeline: DEALER con hasta K solicitudes en vuelo
+        ctx = zmq.Context()
+        banner_inicio(GC_ADDR, args.timeout, total)
+        try:
+            ok, fail = enviar_pipeline(ctx, batch, args.timeout, args.pipeline)
+            print_resumen(ok, fail)
+        finally:
+            ctx.term()
+        return
+
     # ZMQ: REQ → GC
     ctx = zmq.Context()
     s = ctx.socket(zmq.REQ)
+    tune_socket(s)
+    # Sin lockstep estricto: tras un timeout el próximo send es válido
+    # (antes el segundo send tras un timeout moría con EFSM) y las
+    # respuestas tardías del intento anterior se descartan solas.
+    s.setsockopt(zmq.REQ_RELAXED, 1)
+    s.setsockopt(zmq.REQ_CORRELATE, 1)
     s.connect(GC_ADDR)
 
     banner_inicio(GC_ADDR, args.timeout, total)
 
-    ok = 0
-    fail = 0
-
     try:
-        for i, req in enumerate(batch, start=1):
-            print_bloque_envio(i, total, req)
-
-            wire = to_json_string(req)     # JSON → string
-            s.send_string(wire)            # su GC usa recv_string()
-
-            if s.poll(int(args.timeout * 1000), zmq.POLLIN):
-                raw = s.recv_string()      # su GC responde string JSON
-                try:
-                    r = json.loads(raw)
-                except Exception:
-                    r = {}
-                # Su GC responde {"estado":"ok"} → normalizamos a OK/ERROR
-                status = r.get("status")
-                if not status:
-                    estado = str(r.get("estado", "")).upper() if r else ""
-                    status = "OK" if estado in ("OK", "OKAY", "SUCCESS") else "ERROR"
-                print_bloque_respuesta(status, r)
-                ok += int(status == "OK")
-                fail += int(status != "OK")
-            else:
-                print_bloque_timeout(args.timeout)
-                fail += 1
-
+        ok, fail = run_batch(s, batch, args.timeout)
         print_resumen(ok, fail)
-
     finally:
         try:
             s.close(linger=0)